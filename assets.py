@@ -0,0 +1,138 @@
+from typing import Dict, List, Sequence, Tuple
+from hashlib import sha1
+from threading import Thread
+import math
+import os
+import pygame as pg
+import funcs as f
+
+
+ATLAS_EXTENSION: str = '.atlas'
+
+
+def atlas_grid(count: int) -> Tuple[int, int]:
+
+    # Columns and rows of a roughly square atlas holding count sprites
+    columns = max(math.ceil(math.sqrt(count)), 1)
+
+    return columns, max(-(-count // columns), 1)
+
+
+class Atlas:
+    # Sprites of one size packed row by row into a single surface. Every
+    # sprite is a subsurface, so they all share the atlas pixels.
+    def __init__(self, paths: Sequence[str], size: Tuple[int, int], surface: pg.Surface = None):
+
+        self.paths: Tuple[str] = tuple(paths)
+        self.size: Tuple[int, int] = tuple(size)
+        self.columns, self.rows = atlas_grid(len(self.paths))
+
+        if surface is None:
+
+            surface = pg.Surface((self.columns * self.size[0], self.rows * self.size[1]), pg.SRCALPHA)
+
+            for i, path in enumerate(self.paths):
+                surface.blit(pg.transform.scale(f.sprite_cache.source(path), self.size), self.__region(i))
+
+        self.surface: pg.Surface = surface
+        self.sprites: Dict[str, pg.Surface] = {path: self.surface.subsurface(self.__region(i))
+                                               for i, path in enumerate(self.paths)}
+
+    def __region(self, index: int) -> pg.Rect:
+
+        return pg.Rect(index % self.columns * self.size[0], index // self.columns * self.size[1], *self.size)
+
+    def __contains__(self, path: str) -> bool:
+
+        return path in self.sprites
+
+    def get(self, path: str) -> pg.Surface:
+
+        return self.sprites[path]
+
+
+def atlas_key(paths: Sequence[str], size: Tuple[int, int]) -> str:
+
+    # Changing, adding or reordering a source file gives a new atlas
+    digest = sha1(f'{size[0]}x{size[1]}'.encode())
+
+    for path in paths:
+
+        digest.update(path.encode())
+
+        if os.path.exists(path):
+            stat = os.stat(path)
+            digest.update(f'{stat.st_size} {stat.st_mtime_ns}'.encode())
+
+    return digest.hexdigest()
+
+
+def cached_atlas(paths: Sequence[str], size: Tuple[int, int], cache_folder: str = 'cache') -> Atlas:
+
+    # Scaled atlases are kept as raw RGBA per tile size, a warm start skips
+    # decoding and scaling every PNG and reads one file instead
+    size = tuple(size)
+    out_path = os.path.join(cache_folder, atlas_key(paths, size) + ATLAS_EXTENSION)
+    columns, rows = atlas_grid(len(paths))
+    atlas_size = (columns * size[0], rows * size[1])
+
+    if os.path.exists(out_path):
+
+        with open(out_path, 'rb') as file:
+            data = file.read()
+
+        if len(data) == atlas_size[0] * atlas_size[1] * 4:
+            return Atlas(paths, size, surface=pg.image.frombytes(data, atlas_size, 'RGBA').convert_alpha())
+
+    atlas = Atlas(paths, size)
+
+    # Written aside under a name of this process and renamed, a second game
+    # never reads a half written atlas and two games never share one file
+    tmp_path = f'{out_path}.{os.getpid()}.tmp'
+
+    try:
+
+        os.makedirs(cache_folder, exist_ok=True)
+
+        with open(tmp_path, 'wb') as file:
+            file.write(pg.image.tobytes(atlas.surface, 'RGBA'))
+
+        os.replace(tmp_path, out_path)
+
+    # A cache that can not be written only costs the next start its speed
+    except OSError as error:
+
+        print(f'Can not write atlas cache. (func=cached_atlas, {out_path=}, {error=})')
+
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+    return atlas
+
+
+def stream_music(path: str) -> Thread:
+
+    # Opening the device and decoding the track happen off the main thread,
+    # the game draws its first frame without waiting for them
+    def start() -> None:
+
+        try:
+
+            pg.mixer.init()
+            pg.mixer.music.load(path)
+            pg.mixer.music.play(-1)
+
+        except pg.error as error:
+            print(f'No music. (func=stream_music, {path=}, {error=})')
+
+    thread = Thread(target=start, name='music', daemon=True)
+    thread.start()
+
+    return thread
+
+
+def sprite_paths(folder: str, names: Sequence[str]) -> List[str]:
+
+    return [os.path.join(folder, f'{name}.png') for name in names]
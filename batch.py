@@ -0,0 +1,159 @@
+from typing import Dict, List, Sequence
+from argparse import ArgumentParser
+from multiprocessing import Pool
+from time import perf_counter
+from traceback import format_exc
+import json
+import os
+import numpy as np
+import funcs as f
+import fieldc
+from headless import HeadlessGame, Policies
+
+
+# Worker side settings, set once per process by _init_worker
+_settings: Dict[str, object] = {}
+
+
+def _init_worker(settings: Dict[str, object]) -> None:
+
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+    _settings.update(settings)
+
+
+def play_one(seed: int) -> Dict[str, object]:
+
+    calls = f.astar_stats['calls']
+    start = perf_counter()
+    headless = None
+
+    # A game that raises becomes a row with its error, the rest of the batch keeps going
+    try:
+
+        headless = HeadlessGame(field_path=_settings['field_path'], swarm=_settings['swarm'], seed=seed,
+                                ghosts=_settings['ghosts'])
+        result = headless.run(_settings['ticks'], Policies[_settings['policy']](seed))
+
+        return {
+            'seed': seed,
+            **result,
+            'path ms': round(headless.game.profiler.totals.get('pathfinding', 0.0), 3),
+            'Astar calls': f.astar_stats['calls'] - calls,
+            'wall s': round(perf_counter() - start, 3)
+        }
+
+    except Exception as error:
+
+        return {'seed': seed, 'error': repr(error), 'traceback': format_exc(),
+                'wall s': round(perf_counter() - start, 3)}
+
+    finally:
+
+        if headless is not None:
+            headless.game.close()
+
+
+def summarize(results: Sequence[Dict[str, object]]) -> Dict[str, Dict[str, float]]:
+
+    summary: Dict[str, Dict[str, float]] = {}
+
+    if not results:
+        return summary
+
+    for key in ('score', 'ticks', 'ghosts eaten', 'pellets left', 'path ms', 'Astar calls'):
+
+        values = np.array([result[key] for result in results], dtype=np.float64)
+
+        summary[key] = {
+            'mean': round(float(values.mean()), 3),
+            'std': round(float(values.std()), 3),
+            'min': round(float(values.min()), 3),
+            'p50': round(float(np.percentile(values, 50)), 3),
+            'p95': round(float(np.percentile(values, 95)), 3),
+            'max': round(float(values.max()), 3)
+        }
+
+    summary['caught'] = {'rate': round(sum(result['caught'] for result in results) / len(results), 3)}
+
+    return summary
+
+
+def run_batch(field_path: str, games: int, seed: int = 0, ghosts: Sequence[str] = ('Red', 'Green', 'Blue', 'Yellow'),
+              swarm: int = 0, policy: str = 'random', ticks: int = 10000, workers: int = 0,
+              stream_path: str = None) -> Dict[str, object]:
+
+    # The field is compiled once here, every worker maps the same file read-only
+    # and shares its pages instead of parsing the text field again
+    settings = {'field_path': fieldc.cached_compile(field_path), 'swarm': swarm, 'ghosts': list(ghosts),
+                'policy': policy, 'ticks': ticks}
+
+    workers = workers or os.cpu_count() or 1
+    results: List[Dict[str, object]] = []
+
+    stream = open(stream_path, 'w') if stream_path else None
+    start = perf_counter()
+
+    pool = Pool(workers, initializer=_init_worker, initargs=(settings,))
+
+    # One game per task keeps every core busy until the very last games
+    for result in pool.imap_unordered(play_one, range(seed, seed + games), chunksize=1):
+
+        results.append(result)
+
+        if stream is not None:
+            stream.write(json.dumps(result) + '\n')
+            stream.flush()
+
+    # Workers exit on their own, terminate() can leave a pygame worker hanging
+    pool.close()
+    pool.join()
+
+    elapsed = perf_counter() - start
+
+    if stream is not None:
+        stream.close()
+
+    failed = [result for result in results if 'error' in result]
+    played = [result for result in results if 'error' not in result]
+
+    return {
+        'settings': {**settings, 'field_path': field_path, 'games': games, 'seed': seed, 'workers': workers},
+        'elapsed s': round(elapsed, 3),
+        'games/s': round(games / elapsed, 3),
+        'ticks/s': round(sum(result['ticks'] for result in played) / elapsed),
+        'failed': len(failed),
+        'errors': sorted(({'seed': result['seed'], 'error': result['error']} for result in failed),
+                         key=lambda error: error['seed']),
+        'summary': summarize(played)
+    }
+
+
+if __name__ == '__main__':
+
+    parser = ArgumentParser(description='Play many headless games on every core and aggregate the results.')
+    parser.add_argument('--field', default='field/field.txt')
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--ghosts', default='Red,Green,Blue,Yellow', help='comma separated classic ghosts')
+    parser.add_argument('--swarm', type=int, default=0, help='number of swarm ghosts instead of the classic ones')
+    parser.add_argument('--policy', default='random', choices=tuple(Policies))
+    parser.add_argument('--ticks', type=int, default=10000, help='tick limit per game')
+    parser.add_argument('--workers', type=int, default=0, help='processes, 0 uses every core')
+    parser.add_argument('--stream', default=None, help='JSON lines file with one result per game')
+    parser.add_argument('-o', '--output', default='batch_results.json')
+    args = parser.parse_args()
+
+    report = run_batch(args.field, args.games, args.seed, args.ghosts.split(','), args.swarm, args.policy,
+                       args.ticks, args.workers, args.stream)
+
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+
+    print(f'{args.games} games in {report["elapsed s"]} s, {report["ticks/s"]} ticks/s, {report["failed"]} failed.')
+
+    for error in report['errors']:
+        print(f'Game failed. (func=play_one, seed={error["seed"]}, error={error["error"]})')
+
+    for key, stats in report['summary'].items():
+        print(f'{key:<14} ' + '  '.join(f'{name} {value}' for name, value in stats.items()))
@@ -0,0 +1,214 @@
+from typing import Callable, Dict, List, Tuple
+from argparse import ArgumentParser
+from random import Random
+from statistics import mean, median
+from tempfile import TemporaryDirectory
+from time import perf_counter, strftime
+import json
+import os
+import platform
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame as pg
+import funcs as f
+import grid
+import assets
+from main import Game, Field
+from headless import random_policy
+
+
+SPRITES_FOLDER: str = 'sprites/field_sprites'
+TILE_SIZE: int = 8
+# Fixed like a player's window, fields bigger than it scroll and cull offscreen chunks
+WINDOW: Tuple[int, int] = (800, 600)
+
+
+def generate_field(size: int, seed: int = 0) -> List[List[str]]:
+    # Depth-first maze on odd cells with extra openings for loops,
+    # the left corridor keeps the Pacman spawn at (1, 2) walkable
+    rng = Random(seed)
+    field = [['tu1'] * size for _ in range(size)]
+
+    stack = [(1, 1)]
+    field[1][1] = 'f'
+
+    while stack:
+
+        x, y = stack[-1]
+        options = [(x + dx, y + dy, dx, dy) for dx, dy in ((0, 2), (2, 0), (0, -2), (-2, 0))
+                   if 0 < x + dx < size - 1 and 0 < y + dy < size - 1 and field[y + dy][x + dx] != 'f']
+
+        if not options:
+            stack.pop()
+            continue
+
+        nx, ny, dx, dy = rng.choice(options)
+        field[y + dy // 2][x + dx // 2] = 'f'
+        field[ny][nx] = 'f'
+        stack.append((nx, ny))
+
+    for y in range(1, size - 1):
+
+        field[y][1] = 'f'
+
+        for x in range(2, size - 1):
+            if field[y][x] != 'f' and rng.random() < .1:
+                field[y][x] = 'f'
+
+    free = [(x, y) for y in range(size) for x in range(size) if field[y][x] == 'f' and x > 1]
+
+    for x, y in rng.sample(free, 4):
+        field[y][x] = 'gh'
+
+    return field
+
+
+def write_field(field: List[List[str]], path: str) -> None:
+
+    with open(path, 'w') as file:
+        file.write('\n'.join('\t'.join(row) for row in field))
+
+
+def measure(func: Callable[[], object], repeat: int) -> Dict[str, float]:
+
+    times: List[float] = []
+
+    for _ in range(repeat):
+
+        start = perf_counter()
+        func()
+        times.append((perf_counter() - start) * 1000)
+
+    times.sort()
+
+    return {
+        'repeat': repeat,
+        'min_ms': times[0],
+        'mean_ms': mean(times),
+        'median_ms': median(times),
+        'p95_ms': times[min(len(times) - 1, int(len(times) * .95))],
+        'max_ms': times[-1]
+    }
+
+
+def bench_field(name: str, field_path: str, repeat: int, ticks: int, seed: int) -> List[Dict]:
+
+    results: List[Dict] = []
+    wall_keys = tuple(open(os.path.join(SPRITES_FOLDER, 'wall_keys.txt')).readline().split())
+    sprite_keys = tuple(open(os.path.join(SPRITES_FOLDER, 'sprite_keys.txt')).readline().split())
+
+    def record(bench: str, stats: Dict[str, float]) -> None:
+
+        results.append({'bench': bench, 'field': name, 'size': size, **stats})
+        print(f'{name:>12} {bench:<22} median {stats["median_ms"]:9.3f} ms, p95 {stats["p95_ms"]:9.3f} ms')
+
+    draw_field, play_field = f.read_field(field_path, wall_keys)
+    size = len(draw_field)
+
+    record('read_field', measure(lambda: f.read_field(field_path, wall_keys), repeat))
+    record('read_grid', measure(lambda: grid.read_grid(field_path, sprite_keys, wall_keys), repeat))
+
+    # Display mode must exist before surfaces can be converted
+    screen = pg.display.set_mode(WINDOW)
+
+    record('load_sprite_collection', measure(
+        lambda: f.load_sprite_collection(SPRITES_FOLDER, sprite_keys, (TILE_SIZE, TILE_SIZE)), repeat
+    ))
+
+    # Cold builds decode and scale every PNG, warm ones read the cached atlas
+    tile_paths = assets.sprite_paths(SPRITES_FOLDER, sprite_keys)
+
+    def cold_atlas() -> None:
+
+        f.sprite_cache.sources.clear()
+
+        with TemporaryDirectory() as cache_folder:
+            assets.cached_atlas(tile_paths, (TILE_SIZE, TILE_SIZE), cache_folder)
+
+    record('atlas cold', measure(cold_atlas, repeat))
+
+    with TemporaryDirectory() as cache_folder:
+
+        assets.cached_atlas(tile_paths, (TILE_SIZE, TILE_SIZE), cache_folder)
+        record('atlas warm', measure(
+            lambda: assets.cached_atlas(tile_paths, (TILE_SIZE, TILE_SIZE), cache_folder), repeat
+        ))
+
+    rng = Random(seed)
+    free = [(x, y) for y in range(size) for x in range(size) if play_field[y][x] != 1]
+    pairs = [(rng.choice(free), rng.choice(free)) for _ in range(repeat)]
+    pairs_iter = iter(pairs)
+
+    record('Astar', measure(lambda: f.Astar(play_field, *next(pairs_iter)), repeat))
+
+    field = Field(window_size=WINDOW, field_path=field_path, field_sprites_folder=SPRITES_FOLDER,
+                  min_tile_size=TILE_SIZE)
+
+    record('Field.draw', measure(lambda: field.draw(screen), repeat))
+
+    games: List[Game] = []
+
+    def first_frame() -> None:
+
+        games.append(Game(w=WINDOW[0], h=WINDOW[1], headless=True, field_path=field_path, min_tile_size=TILE_SIZE))
+        games[-1].draw()
+        pg.display.flip()
+
+    record('first frame', measure(first_frame, 1))
+
+    game = games[0]
+    policy = random_policy(seed)
+
+    def tick() -> None:
+
+        direction = policy(game)
+
+        if direction is not None:
+            game.pacman.change_dir(direction)
+
+        game.move()
+
+    record('Game.move', measure(tick, ticks))
+
+    return results
+
+
+if __name__ == '__main__':
+
+    parser = ArgumentParser(description='Time the hot paths on the shipped and generated fields.')
+    parser.add_argument('--sizes', type=int, nargs='*', default=[20, 50, 100, 200, 400])
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--ticks', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='bench_results.json')
+    args = parser.parse_args()
+
+    results: List[Dict] = bench_field('field.txt', 'field/field.txt', args.repeat, args.ticks, args.seed)
+
+    with TemporaryDirectory() as folder:
+        for size in args.sizes:
+
+            path = os.path.join(folder, f'maze_{size}.txt')
+            write_field(generate_field(size, args.seed), path)
+
+            results += bench_field(f'maze_{size}', path, args.repeat, args.ticks, args.seed)
+
+    report = {
+        'meta': {
+            'time': strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'pygame': pg.version.ver,
+            'platform': platform.platform(),
+            'video_driver': pg.display.get_driver(),
+            'window': list(WINDOW),
+            'tile_size': TILE_SIZE
+        },
+        'results': results
+    }
+
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+
+    print(f'Results are written to {args.output}.')
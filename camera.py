@@ -0,0 +1,42 @@
+from typing import List, Tuple
+import pygame as pg
+
+
+class Camera:
+    # Window onto the field. Everything on the field moves in world pixels,
+    # drawing maps world pixels to the screen through to_screen.
+    def __init__(self, view_size: Tuple[int, int], world_size: Tuple[int, int]):
+
+        self.view_size: Tuple[int, int] = view_size
+        self.world_size: Tuple[int, int] = world_size
+        self.pos: List[int] = [0, 0]
+
+    def follow(self, center: Tuple[float, float]) -> bool:
+
+        # Keeps center in the middle of the view without showing past the
+        # world edges, returns whether the view moved
+        pos = [int(min(max(center[i] - self.view_size[i] / 2, 0), max(self.world_size[i] - self.view_size[i], 0)))
+               for i in (0, 1)]
+
+        moved = pos != self.pos
+        self.pos = pos
+
+        return moved
+
+    def to_screen(self, pos: Tuple[float, float]) -> Tuple[float, float]:
+
+        return pos[0] - self.pos[0], pos[1] - self.pos[1]
+
+    def to_world(self, pos: Tuple[float, float]) -> Tuple[float, float]:
+
+        return pos[0] + self.pos[0], pos[1] + self.pos[1]
+
+    @property
+    def view(self) -> pg.Rect:
+
+        return pg.Rect(self.pos, self.view_size)
+
+    def sees(self, pos: Tuple[float, float], size: Tuple[int, int]) -> bool:
+
+        return pos[0] < self.pos[0] + self.view_size[0] and pos[0] + size[0] > self.pos[0] and \
+            pos[1] < self.pos[1] + self.view_size[1] and pos[1] + size[1] > self.pos[1]
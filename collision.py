@@ -0,0 +1,118 @@
+from typing import Callable, Dict, Iterable, List, NamedTuple, Tuple
+
+
+GHOST_EATEN: str = 'ghost eaten'
+PLAYER_CAUGHT: str = 'player caught'
+
+
+class CollisionEvent(NamedTuple):
+    kind: str
+    entity: object
+    other: object
+
+
+# A rule gets the two overlapping entities and returns the event kind or None
+Rule = Callable[[object, object], str]
+
+
+def overlaps(a, b) -> bool:
+
+    return a.screen_pos[0] < b.screen_pos[0] + b.size[0] and \
+        b.screen_pos[0] < a.screen_pos[0] + a.size[0] and \
+        a.screen_pos[1] < b.screen_pos[1] + b.size[1] and \
+        b.screen_pos[1] < a.screen_pos[1] + a.size[1]
+
+
+class SpatialHash:
+    # Buckets entities by the tile under their top left corner, entities are
+    # at most one tile big so overlapping ones sit in the same or adjacent buckets
+    def __init__(self, tile_size: int, origin: Tuple[int, int]):
+
+        self.tile_size: int = tile_size
+        self.origin: Tuple[int, int] = origin
+        self.buckets: Dict[Tuple[int, int], List[object]] = {}
+
+    def clear(self) -> None:
+
+        self.buckets.clear()
+
+    def bucket(self, entity) -> Tuple[int, int]:
+
+        return (int(entity.screen_pos[0] - self.origin[0]) // self.tile_size,
+                int(entity.screen_pos[1] - self.origin[1]) // self.tile_size)
+
+    def insert(self, entity) -> None:
+
+        self.buckets.setdefault(self.bucket(entity), []).append(entity)
+
+    def pairs(self) -> Iterable[Tuple[object, object]]:
+
+        # Every bucket meets itself and half of its neighbours, so each pair shows up once
+        for (x, y), entities in self.buckets.items():
+
+            for i, entity in enumerate(entities):
+                for other in entities[i + 1:]:
+                    yield entity, other
+
+            for dx, dy in ((1, 0), (-1, 1), (0, 1), (1, 1)):
+
+                for other in self.buckets.get((x + dx, y + dy), ()):
+                    for entity in entities:
+                        yield entity, other
+
+
+class CollisionSystem:
+    def __init__(self, tile_size: int, origin: Tuple[int, int]):
+
+        self.grid: SpatialHash = SpatialHash(tile_size, origin)
+        self.rules: Dict[Tuple[type, type], Rule] = {}
+        self.resolved: Dict[Tuple[type, type], Tuple[Rule, bool]] = {}
+
+    def add_rule(self, kind1: type, kind2: type, rule: Rule) -> None:
+
+        self.rules[(kind1, kind2)] = rule
+        self.resolved.clear()
+
+    def __rule(self, entity, other) -> Tuple[Rule, object, object]:
+
+        key = (type(entity), type(other))
+
+        if key not in self.resolved:
+
+            self.resolved[key] = (None, False)
+
+            for kind1 in key[0].__mro__:
+                for kind2 in key[1].__mro__:
+
+                    if self.resolved[key][0] is None and (kind1, kind2) in self.rules:
+                        self.resolved[key] = (self.rules[(kind1, kind2)], False)
+
+                    elif self.resolved[key][0] is None and (kind2, kind1) in self.rules:
+                        self.resolved[key] = (self.rules[(kind2, kind1)], True)
+
+        rule, swap = self.resolved[key]
+
+        return (rule, other, entity) if swap else (rule, entity, other)
+
+    def update(self, entities: Iterable[object]) -> List[CollisionEvent]:
+
+        self.grid.clear()
+
+        for entity in entities:
+            self.grid.insert(entity)
+
+        events: List[CollisionEvent] = []
+
+        for entity, other in self.grid.pairs():
+
+            rule, entity, other = self.__rule(entity, other)
+
+            if rule is None or not overlaps(entity, other):
+                continue
+
+            kind = rule(entity, other)
+
+            if kind is not None:
+                events.append(CollisionEvent(kind, entity, other))
+
+        return events
@@ -0,0 +1,244 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+from argparse import ArgumentParser
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import Connection
+from time import perf_counter
+import os
+import numpy as np
+import fieldc
+from headless import HeadlessGame
+
+
+# Action 0 keeps the current direction, the others steer Pacman
+ACTIONS: Tuple[Optional[Tuple[int, int]]] = (None, (0, -1), (1, 0), (0, 1), (-1, 0))
+
+Observation = Dict[str, np.ndarray]
+
+
+class Env:
+    # One headless game behind reset/step/observe, every step runs frame_skip ticks.
+    # Episodes without an explicit seed advance it by seed_stride, envs of a batch
+    # seeded seed + i with the batch size as stride never replay each other's seeds.
+    def __init__(self, field_path: str = 'field/field.txt', swarm: int = 0, seed: int = 0,
+                 frame_skip: int = 1, max_ticks: int = 100000, seed_stride: int = 1):
+
+        self.field_path: str = field_path
+        self.swarm: int = swarm
+        self.seed: int = seed
+        self.seed_stride: int = seed_stride
+        self.frame_skip: int = frame_skip
+        self.max_ticks: int = max_ticks
+        self.episodes: int = 0
+        self.headless: HeadlessGame = None
+
+        self.reset(seed)
+
+    def reset(self, seed: Optional[int] = None) -> Observation:
+
+        # Without an explicit seed every episode gets the next one of this env
+        self.seed = seed if seed is not None else self.seed + self.seed_stride
+        self.episodes += 1
+
+        if self.headless is not None:
+            self.headless.game.close()
+
+        self.headless = HeadlessGame(field_path=self.field_path, swarm=self.swarm, seed=self.seed)
+
+        return self.observe()
+
+    def observe(self) -> Observation:
+
+        game = self.headless.game
+
+        if game.swarm is not None:
+            ghosts = game.swarm.tile.copy()
+        else:
+            ghosts = np.array([ghost.field_pos for ghost in game.ghosts.values()], dtype=np.int32)
+
+        return {
+            'tiles': game.field.tiles.copy(),
+            'pellets': game.field.consumables.present.copy(),
+            'pacman': np.array(game.pacman.field_pos, dtype=np.int32),
+            'ghosts': ghosts,
+            'frightened': np.array(game.pacman.can_eat_ghosts),
+            'score': np.array(game.pacman.score, dtype=np.int64),
+            'ticks': np.array(game.ticks, dtype=np.int64)
+        }
+
+    def step(self, action: int) -> Tuple[Observation, float, bool, Dict[str, int]]:
+
+        game = self.headless.game
+        score = game.pacman.score
+        direction = ACTIONS[action]
+
+        for _ in range(self.frame_skip):
+
+            alive = self.headless.step(direction)
+            direction = None
+
+            if not alive or game.ticks >= self.max_ticks:
+                break
+
+        done = self.headless.is_over or game.ticks >= self.max_ticks
+        info = {'score': game.pacman.score, 'ticks': game.ticks, 'level': game.level}
+
+        # Finished episodes start over right away, the returned observation is the new one
+        if done:
+            return self.reset(), float(game.pacman.score - score), True, info
+
+        return self.observe(), float(game.pacman.score - score), False, info
+
+    def close(self) -> None:
+
+        self.headless.game.close()
+
+
+def stack(observations: Sequence[Observation]) -> Observation:
+
+    return {key: np.stack([observation[key] for observation in observations]) for key in observations[0]}
+
+
+def _worker(conn: Connection, settings: Dict[str, object], seeds: List[int]) -> None:
+
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+    envs = [Env(seed=seed, **settings) for seed in seeds]
+
+    while True:
+
+        command, data = conn.recv()
+
+        match command:
+
+            case 'reset':
+                conn.send([env.reset(seed) for env, seed in zip(envs, data)])
+
+            case 'step':
+                conn.send([env.step(action) for env, action in zip(envs, data)])
+
+            case 'observe':
+                conn.send([env.observe() for env in envs])
+
+            case 'close':
+                for env in envs:
+                    env.close()
+
+                conn.close()
+                return
+
+
+class VectorEnv:
+    # A batch of independent games stepped together. With workers the batch is
+    # split into contiguous shards, one process and one pipe per shard.
+    def __init__(self, count: int, field_path: str = 'field/field.txt', swarm: int = 0, seed: int = 0,
+                 frame_skip: int = 1, max_ticks: int = 100000, workers: int = 0):
+
+        self.count: int = count
+        # Compiled once here, every env maps the same field and its next-hop table
+        self.settings: Dict[str, object] = {'field_path': fieldc.cached_compile(field_path), 'swarm': swarm,
+                                            'frame_skip': frame_skip, 'max_ticks': max_ticks, 'seed_stride': count}
+        seeds = [seed + i for i in range(count)]
+
+        self.envs: List[Env] = []
+        self.pipes: List[Connection] = []
+        self.processes: List[Process] = []
+        self.shards: List[slice] = []
+
+        if workers <= 0:
+            self.envs = [Env(seed=s, **self.settings) for s in seeds]
+            return
+
+        workers = min(workers, count)
+
+        for i in range(workers):
+
+            shard = slice(count * i // workers, count * (i + 1) // workers)
+            parent, child = Pipe()
+
+            process = Process(target=_worker, args=(child, self.settings, seeds[shard]), daemon=True)
+            process.start()
+            child.close()
+
+            self.shards.append(shard)
+            self.pipes.append(parent)
+            self.processes.append(process)
+
+    def __scatter(self, command: str, data: Optional[Sequence] = None) -> list:
+
+        for pipe, shard in zip(self.pipes, self.shards):
+            pipe.send((command, data[shard] if data is not None else None))
+
+        return [result for pipe in self.pipes for result in pipe.recv()]
+
+    def reset(self, seeds: Optional[Sequence[int]] = None) -> Observation:
+
+        seeds = list(seeds) if seeds is not None else [None] * self.count
+
+        if self.pipes:
+            return stack(self.__scatter('reset', seeds))
+
+        return stack([env.reset(seed) for env, seed in zip(self.envs, seeds)])
+
+    def observe(self) -> Observation:
+
+        if self.pipes:
+            return stack(self.__scatter('observe'))
+
+        return stack([env.observe() for env in self.envs])
+
+    def step(self, actions: Sequence[int]) -> Tuple[Observation, np.ndarray, np.ndarray, List[Dict[str, int]]]:
+
+        actions = np.asarray(actions).tolist()
+
+        if self.pipes:
+            results = self.__scatter('step', actions)
+        else:
+            results = [env.step(action) for env, action in zip(self.envs, actions)]
+
+        observations, rewards, dones, infos = zip(*results)
+
+        return stack(observations), np.array(rewards, dtype=np.float32), np.array(dones), list(infos)
+
+    def close(self) -> None:
+
+        for env in self.envs:
+            env.close()
+
+        for pipe in self.pipes:
+            pipe.send(('close', None))
+            pipe.close()
+
+        for process in self.processes:
+            process.join()
+
+        self.envs, self.pipes, self.processes, self.shards = [], [], [], []
+
+
+if __name__ == '__main__':
+
+    parser = ArgumentParser(description='Measure environment steps per second with random actions.')
+    parser.add_argument('--field', default='field/field.txt')
+    parser.add_argument('--envs', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=0, help='processes, 0 steps the batch in-process')
+    parser.add_argument('--steps', type=int, default=1000)
+    parser.add_argument('--frame-skip', type=int, default=1)
+    parser.add_argument('--swarm', type=int, default=0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+    vector = VectorEnv(args.envs, field_path=args.field, swarm=args.swarm, seed=args.seed,
+                       frame_skip=args.frame_skip, workers=args.workers)
+    rng = np.random.default_rng(args.seed)
+
+    start = perf_counter()
+
+    for _ in range(args.steps):
+        vector.step(rng.integers(len(ACTIONS), size=args.envs))
+
+    elapsed = perf_counter() - start
+
+    vector.close()
+
+    print(f'{args.envs} envs, {args.workers} workers: {round(args.envs * args.steps / elapsed)} env steps/s.')
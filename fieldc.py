@@ -0,0 +1,184 @@
+from typing import List, Optional, Tuple
+from argparse import ArgumentParser
+from hashlib import sha1
+import mmap
+import os
+import struct
+import numpy as np
+import grid
+import navigation as nav
+import topology as topo
+
+
+FIELD_MAGIC: bytes = b'PFLD'
+FIELD_VERSION: int = 2
+EXTENSION: str = '.pcf'
+
+FLAG_PATH_TABLE: int = 1
+
+# Part of the cache key of compiled text fields, bumped whenever compile_field
+# writes different bytes for the same inputs
+FORMAT_VERSION: int = 1
+
+# magic, version, flags, width, height, keys, sprite keys, spawns, pellets,
+# then offset and size of every section
+HEADER = struct.Struct('<4sHHIIIIII11Q')
+
+SPAWN_KEYS: Tuple[str] = ('gh',)
+PELLET_KEYS: Tuple[str] = ('f', 'pu')
+
+
+def read_keys(folder: str, name: str) -> Tuple[str]:
+
+    with open(os.path.join(folder, name)) as file:
+        return tuple(file.readline().split())
+
+
+def compile_field(field_path: str, out_path: str, field_sprites_folder: str = 'sprites/field_sprites',
+                  tables: bool = True, max_cells: int = nav.OFFLINE_TABLE_CELLS) -> None:
+
+    sprite_keys = read_keys(field_sprites_folder, 'sprite_keys.txt')
+    wall_keys = read_keys(field_sprites_folder, 'wall_keys.txt')
+
+    tiles, play, tile_keys = grid.read_grid(field_path, sprite_keys, wall_keys)
+    codes = grid.tile_codes(tile_keys)
+
+    spawns = grid.find_tiles(tiles, (codes[key] for key in SPAWN_KEYS if key in codes))
+    pellets = grid.find_tiles(tiles, (codes[key] for key in PELLET_KEYS if key in codes))
+
+    walkable = grid.walkable_mask(play)
+
+    # Junctions, corridors and components are analysed here once, loading only reads them
+    graph = topo.JunctionGraph(play.tolist(), walkable, grid.neighbour_counts(walkable))
+
+    table: Optional[nav.NextHopTable] = None
+
+    if tables and np.count_nonzero(play != grid.WALL) <= max_cells:
+        table = nav.NextHopTable.build(play.tolist())
+
+    sections: List[bytes] = [
+        '\n'.join(tile_keys).encode(),
+        tiles.tobytes(),
+        play.tobytes(),
+        np.packbits(walkable).tobytes(),
+        np.array(spawns, dtype=np.int32).reshape(-1, 2).tobytes(),
+        np.array(pellets, dtype=np.int32).reshape(-1, 2).tobytes(),
+        table.to_bytes() if table is not None else b'',
+        graph.to_bytes()
+    ]
+
+    # Sections start on 8 byte boundaries so every array view stays aligned
+    offsets: List[int] = []
+    position = HEADER.size
+
+    for section in sections:
+        offsets.append(position)
+        position += len(section) + (-len(section)) % 8
+
+    header = HEADER.pack(
+        FIELD_MAGIC, FIELD_VERSION, FLAG_PATH_TABLE if table is not None else 0,
+        tiles.shape[1], tiles.shape[0], len(tile_keys), len(sprite_keys), len(spawns), len(pellets),
+        offsets[0], len(sections[0]), offsets[1], offsets[2], offsets[3], offsets[4], offsets[5],
+        offsets[6], len(sections[6]), offsets[7], len(sections[7])
+    )
+
+    with open(out_path, 'wb') as file:
+
+        file.write(header)
+
+        for section in sections:
+            file.write(section + bytes((-len(section)) % 8))
+
+
+def cached_compile(field_path: str, field_sprites_folder: str = 'sprites/field_sprites',
+                   cache_folder: str = 'cache') -> str:
+
+    # Compiled fields are already mapped as they are, text ones are compiled once per
+    # content of the field and of the tile keys that decide its codes and walls
+    if field_path.endswith(EXTENSION):
+        return field_path
+
+    digest = sha1(f'{FIELD_VERSION} {FORMAT_VERSION}'.encode())
+
+    for path in (field_path, os.path.join(field_sprites_folder, 'sprite_keys.txt'),
+                 os.path.join(field_sprites_folder, 'wall_keys.txt')):
+
+        with open(path, 'rb') as file:
+            digest.update(sha1(file.read()).digest())
+
+    out_path = os.path.join(cache_folder, digest.hexdigest() + EXTENSION)
+
+    if not os.path.exists(out_path):
+
+        os.makedirs(cache_folder, exist_ok=True)
+
+        # Written aside under a name of this process and renamed, readers never
+        # map a half written file and compiling processes never share one
+        tmp_path = f'{out_path}.{os.getpid()}.tmp'
+        compile_field(field_path, tmp_path, field_sprites_folder)
+        os.replace(tmp_path, out_path)
+
+    return out_path
+
+
+class CompiledField:
+    # Memory-mapped compiled field. The map is copy-on-write, so eaten pellets
+    # only copy the pages they touch and the file itself never changes.
+    def __init__(self, path: str):
+
+        self.path: str = path
+
+        with open(path, 'rb') as file:
+            self.map: mmap.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY)
+
+        (magic, version, flags, self.width, self.height, keys_count, sprite_count, spawns_count,
+         pellets_count, keys_offset, keys_size, tiles_offset, play_offset, walk_offset, spawns_offset,
+         pellets_offset, table_offset, table_size, topology_offset, topology_size) = HEADER.unpack_from(self.map)
+
+        if magic != FIELD_MAGIC or version != FIELD_VERSION:
+            raise ValueError(f'Not a compiled field of version {FIELD_VERSION}. (func=CompiledField, {path=})')
+
+        shape = (self.height, self.width)
+        cells = self.width * self.height
+
+        self.tile_keys: Tuple[str] = tuple(self.map[keys_offset:keys_offset + keys_size].decode().split('\n'))
+        self.sprite_keys: Tuple[str] = self.tile_keys[:sprite_count]
+
+        self.tiles: np.ndarray = np.frombuffer(self.map, np.uint8, cells, tiles_offset).reshape(shape)
+        self.play: np.ndarray = np.frombuffer(self.map, np.uint8, cells, play_offset).reshape(shape)
+        self.walk_bits: np.ndarray = np.frombuffer(self.map, np.uint8, (cells + 7) // 8, walk_offset)
+
+        self.spawns: List[Tuple[int, int]] = [tuple(pos) for pos in np.frombuffer(
+            self.map, np.int32, spawns_count * 2, spawns_offset).reshape(-1, 2).tolist()]
+        self.pellets: List[Tuple[int, int]] = [tuple(pos) for pos in np.frombuffer(
+            self.map, np.int32, pellets_count * 2, pellets_offset).reshape(-1, 2).tolist()]
+
+        self.path_table: Optional[nav.NextHopTable] = None
+
+        if flags & FLAG_PATH_TABLE:
+            self.path_table = nav.NextHopTable.from_buffer(
+                memoryview(self.map)[table_offset:table_offset + table_size]
+            )
+
+        # Junction graph stored by compile_field, loading reads it instead of analysing the maze
+        self.topology: memoryview = memoryview(self.map)[topology_offset:topology_offset + topology_size]
+
+    def walkable(self) -> np.ndarray:
+
+        return np.unpackbits(self.walk_bits, count=self.width * self.height).reshape(self.height, self.width) == 1
+
+
+if __name__ == '__main__':
+
+    parser = ArgumentParser(description='Compile a text field into the binary field format.')
+    parser.add_argument('field')
+    parser.add_argument('-o', '--output', default=None)
+    parser.add_argument('--sprites', default='sprites/field_sprites')
+    parser.add_argument('--no-tables', action='store_true', help='skip the precomputed next-hop table')
+    args = parser.parse_args()
+
+    output = args.output or os.path.splitext(args.field)[0] + EXTENSION
+
+    compile_field(args.field, output, args.sprites, tables=not args.no_tables)
+
+    print(f'Field {args.field} is compiled to {output}.')
@@ -1,5 +1,7 @@
-from typing import Iterable, List, Tuple, Dict
+from typing import Iterable, List, Tuple, Dict, Set
+from heapq import heappush, heappop
 from sys import exit
+from os import path as os_path
 from pygame import Surface, transform, image
 from random import randint
 
@@ -15,7 +17,7 @@ def read_field(path: str, wall_keys: Tuple[str]) -> Tuple[List[List[str]], List[
 
         with open(path) as f:
 
-            size = len(f.readline().split())
+            width = len(f.readline().split())
 
             f.seek(0)
 
@@ -23,14 +25,11 @@ def read_field(path: str, wall_keys: Tuple[str]) -> Tuple[List[List[str]], List[
                 for line in f.readlines():
                     split = line.split()
 
-                    if len(split) != size:
+                    if len(split) != width:
                         raise FieldInputFormatError
                     else:
                         draw_field.append(split)
 
-                if len(draw_field) != size:
-                    raise FieldInputFormatError
-
             except FieldInputFormatError:
                 exit('Field input file has wrong formatting. (func=read_field)')
 
@@ -76,17 +75,87 @@ def load_sprite_collection(folder: str, keys: Iterable[str],
     coll: Dict[str, Surface] = {}
 
     for key in keys:
-        coll[key] = surf_import(f'{folder}\\{key}.png', size)
+        coll[key] = surf_import(os_path.join(folder, f'{key}.png'), size)
 
     return coll
 
 
+class SpriteCache:
+    # Every file is decoded once and every derived surface is built once per
+    # (path, size) and shared. Sprites packed in an atlas of their size come
+    # from the atlas instead of being scaled again.
+    def __init__(self):
+
+        self.sources: Dict[str, Surface] = {}
+        self.atlases: Dict[Tuple[int, int], object] = {}
+        self.surfaces: Dict[Tuple[str, Tuple[int, int]], Surface] = {}
+        self.rotations: Dict[Tuple[str, Tuple[int, int]], Dict[Tuple[int, int], Surface]] = {}
+
+    def source(self, path: str) -> Surface:
+
+        if path not in self.sources:
+
+            try:
+
+                self.sources[path] = image.load(path).convert_alpha()
+
+            except OSError:
+                print(f'No such file. (func=SpriteCache.source, {path=})')
+                self.sources[path] = image.load('sprites/pacman.png').convert_alpha()
+
+        return self.sources[path]
+
+    def add_atlas(self, atlas) -> None:
+
+        self.atlases[atlas.size] = atlas
+
+        # Surfaces scaled before the atlas came are swapped for its subsurfaces
+        for path, size in list(self.surfaces):
+            if size == atlas.size and path in atlas:
+                self.surfaces[(path, size)] = atlas.get(path)
+
+    def get(self, path: str, size: Tuple[int, int]) -> Surface:
+
+        key = (path, tuple(size))
+
+        if key not in self.surfaces:
+
+            atlas = self.atlases.get(key[1])
+
+            if atlas is not None and path in atlas:
+                self.surfaces[key] = atlas.get(path)
+            else:
+                self.surfaces[key] = transform.scale(self.source(path), key[1])
+
+        return self.surfaces[key]
+
+    def frames(self, paths: Iterable[str], size: Tuple[int, int]) -> Tuple[Surface]:
+
+        return tuple(self.get(path, size) for path in paths)
+
+    def rotated(self, path: str, size: Tuple[int, int],
+                angles: Dict[Tuple[int, int], float]) -> Dict[Tuple[int, int], Surface]:
+
+        key = (path, tuple(size))
+
+        if key not in self.rotations:
+
+            base = self.get(path, size)
+            self.rotations[key] = {direction: transform.rotate(base, phi)
+                                   for direction, phi in angles.items()}
+
+        return self.rotations[key]
+
+
+sprite_cache = SpriteCache()
+
+
 def adjacent() -> Tuple[Tuple[int, int]]:
     return ((0, 1), (1, 0), (0, -1), (-1, 0))
 
 
 def not_in_field(field: Tuple[Tuple[int, int]], pos: Tuple[int, int]) -> bool:
-    return (pos[0] > len(field) - 1 or pos[0] < 0) or \
+    return (pos[0] > len(field[0]) - 1 or pos[0] < 0) or \
         (pos[1] > len(field) - 1 or pos[1] < 0)
 
 
@@ -95,90 +164,82 @@ def on_bound(field: List[List[int]], node: Tuple[int, int]) -> bool:
         (node[1] == 0 or node[1] == len(field) - 1)
 
 
-class Node:
-    def __init__(self, parent=None, position: Tuple[int, int] = None,
-                 g=0, h=0):
-        self.parent: Node = parent
-        self.position: Tuple[int, int] = position
-
-        self.f = g + h
-        self.g = g
-        self.h = h
-
-    def __eq__(self, other) -> bool:
-        return self.position == other.position
-
-    def __lt__(self, other) -> bool:
-        return self.f < other.f
-
-    def __gt__(self, other) -> bool:
-        return self.f > other.f
+def grid_dist(pos1: Tuple[int, int], pos2: Tuple[int, int]) -> int:
+    # Manhattan distance never overestimates on a 4-connected grid
+    return abs(pos1[0] - pos2[0]) + abs(pos1[1] - pos2[1])
 
 
 def spec_dist(pos1: Tuple[int, int], pos2: Tuple[int, int]) -> int:
     return abs((pos1[0] - pos2[0]) ** 2 + (pos1[1] - pos2[1]) ** 2)
 
 
+# Running totals of Astar calls and expanded nodes, read by the frame profiler
+astar_stats: Dict[str, int] = {'calls': 0, 'expanded': 0}
+
+
 def Astar(field: Tuple[Tuple[int, int]], begin: Tuple[int, int],
-          end: Tuple[int, int]) -> Tuple[List[List[int]], int]:
-    begin_node = Node(position=begin)
-    end_node = Node(position=end)
+          end: Tuple[int, int]) -> Tuple[List[Tuple[int, int]], int]:
+    astar_stats['calls'] += 1
 
-    open_list: List[Node] = []
-    closed_list: List[Node] = []
+    begin = tuple(begin)
+    end = tuple(end)
 
-    open_list.append(begin_node)
+    height = len(field)
+    width = len(field[0])
 
-    while len(open_list) > 0:
+    # Open list entries are plain (f, h, position) tuples, the parent of every
+    # reached position is kept in came_from and its best g in g_score
+    open_heap: List[Tuple[int, int, Tuple[int, int]]] = [(grid_dist(begin, end), grid_dist(begin, end), begin)]
+    came_from: Dict[Tuple[int, int], Tuple[int, int]] = {begin: None}
+    g_score: Dict[Tuple[int, int], int] = {begin: 0}
+    closed: Set[Tuple[int, int]] = set()
 
-        current_node = open_list[0]
-        current_index = 0
+    while open_heap:
 
-        for i, node in enumerate(open_list):
-            if node < current_node:
-                current_node = node
-                current_index = i
+        current = heappop(open_heap)[2]
 
-        open_list.pop(current_index)
-        closed_list.append(current_node)
+        if current in closed:
+            continue
 
-        if current_node == end_node:
+        if current == end:
 
             path = []
-            price = 0
-            node = current_node
+            node = current
 
             while node is not None:
-                path.append(node.position)
-                price += node.f
-                node = node.parent
+                path.append(node)
+                node = came_from[node]
+
+            astar_stats['expanded'] += len(closed)
 
-            return path[::-1], price
+            return path[::-1], g_score[current]
+
+        closed.add(current)
+
+        new_g = g_score[current] + 1
 
         for new_pos in adjacent():
 
-            node_pos = (current_node.position[0] + new_pos[0],
-                        current_node.position[1] - new_pos[1])
+            node_pos = (current[0] + new_pos[0], current[1] - new_pos[1])
 
-            if not_in_field(field, node_pos):
+            if node_pos[0] < 0 or node_pos[0] >= width or \
+                    node_pos[1] < 0 or node_pos[1] >= height:
                 continue
 
-            if field[node_pos[1]][node_pos[0]] == 1:
+            if field[node_pos[1]][node_pos[0]] == 1 or node_pos in closed:
                 continue
 
-            is_unique: bool = True
+            if new_g < g_score.get(node_pos, new_g + 1):
+
+                g_score[node_pos] = new_g
+                came_from[node_pos] = current
 
-            for closed_node in closed_list:
-                if node_pos == closed_node.position:
-                    is_unique = False
+                h = grid_dist(node_pos, end)
+                heappush(open_heap, (new_g + h, h, node_pos))
 
-            for open_node in open_list:
-                if node_pos == open_node.position:
-                    is_unique = False
+    astar_stats['expanded'] += len(closed)
 
-            if is_unique:
-                open_list.append(Node(parent=current_node, position=node_pos,
-                                      g=current_node.h + 1, h=spec_dist(node_pos, end)))
+    return [], 0
 
 
 def get_dir(pos1: Tuple[int, int], pos2: Tuple[int, int]) -> Tuple[int, int]:
@@ -191,3 +252,7 @@ def neg_dir(direction: Tuple[int, int]) -> Tuple[int, int]:
 
 def vec_sum(vec1: Tuple[int, int], vec2: Tuple[int, int]) -> Tuple[int, int]:
     return (vec1[0] + vec2[0], vec1[1] + vec2[1])
+
+
+def lerp(pos1: Tuple[float, float], pos2: Tuple[float, float], alpha: float) -> Tuple[float, float]:
+    return (pos1[0] + (pos2[0] - pos1[0]) * alpha, pos1[1] + (pos2[1] - pos1[1]) * alpha)
@@ -0,0 +1,99 @@
+from typing import Dict, Iterable, List, Sequence, Tuple
+from sys import exit
+import numpy as np
+from funcs import FieldInputFormatError
+
+
+# Values of the play grid, the ghost house door is walkable for ghosts only
+FREE: int = 0
+WALL: int = 1
+DOOR: int = 2
+
+DOOR_KEY: str = 'tu7'
+
+
+def tile_codes(tile_keys: Tuple[str]) -> Dict[str, int]:
+
+    return {key: code for code, key in enumerate(tile_keys)}
+
+
+def read_grid(path: str, sprite_keys: Tuple[str],
+              wall_keys: Tuple[str]) -> Tuple[np.ndarray, np.ndarray, Tuple[str]]:
+    # Returns the uint8 tile grid, the uint8 play grid and the code -> key table,
+    # tokens missing from sprite_keys get codes after the known ones
+    try:
+
+        with open(path) as f:
+            rows = [line.split() for line in f.read().splitlines() if line.strip()]
+
+    except OSError:
+        exit(f'No such file. (func=read_grid, {path=})')
+
+    try:
+
+        width = len(rows[0]) if rows else 0
+
+        if width == 0 or any(len(row) != width for row in rows):
+            raise FieldInputFormatError
+
+    except FieldInputFormatError:
+        exit('Field input file has wrong formatting. (func=read_grid)')
+
+    tile_keys = list(sprite_keys)
+    codes = tile_codes(tuple(tile_keys))
+
+    tokens = [token for row in rows for token in row]
+
+    # Sorted, unknown tokens get the same codes on every run
+    for token in sorted(set(tokens).difference(codes)):
+        codes[token] = len(tile_keys)
+        tile_keys.append(token)
+
+    tiles = np.fromiter((codes[token] for token in tokens), dtype=np.uint8,
+                        count=len(tokens)).reshape(len(rows), width)
+
+    return tiles, play_lookup(tuple(tile_keys), wall_keys)[tiles], tuple(tile_keys)
+
+
+def play_lookup(tile_keys: Tuple[str], wall_keys: Iterable[str]) -> np.ndarray:
+
+    walls = set(wall_keys)
+
+    return np.array([DOOR if key == DOOR_KEY else WALL if key in walls else FREE
+                     for key in tile_keys], dtype=np.uint8)
+
+
+def walkable_mask(play: np.ndarray) -> np.ndarray:
+
+    return play != WALL
+
+
+def mask_positions(mask: np.ndarray) -> List[Tuple[int, int]]:
+    # Row-major (x, y) positions of every set cell
+    ys, xs = np.nonzero(mask)
+
+    return list(zip(xs.tolist(), ys.tolist()))
+
+
+def find_tiles(tiles: np.ndarray, codes: Iterable[int]) -> List[Tuple[int, int]]:
+
+    return mask_positions(np.isin(tiles, tuple(codes)))
+
+
+def neighbour_bits(mask: np.ndarray, steps: Sequence[Tuple[int, int]]) -> np.ndarray:
+    # Bit i of a cell is set when steps[i] (dx, dy) from it lands on a set cell
+    padded = np.pad(mask.astype(np.uint8), 1)
+    height, width = mask.shape
+    bits = np.zeros(mask.shape, dtype=np.uint8)
+
+    for i, (dx, dy) in enumerate(steps):
+        bits |= padded[1 + dy:1 + dy + height, 1 + dx:1 + dx + width] << i
+
+    return bits
+
+
+def neighbour_counts(mask: np.ndarray) -> np.ndarray:
+    # Set 4-neighbours of every cell, cells beyond the border count as unset
+    padded = np.pad(mask.astype(np.uint8), 1)
+
+    return padded[:-2, 1:-1] + padded[2:, 1:-1] + padded[1:-1, :-2] + padded[1:-1, 2:]
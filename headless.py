@@ -0,0 +1,182 @@
+from typing import Callable, Dict, Optional, Sequence, Tuple, Union
+from argparse import ArgumentParser
+import os
+from random import Random
+from time import perf_counter
+import numpy as np
+import grid
+import navigation as nav
+from main import Game, Paths_per_tick
+
+
+Direction = Tuple[int, int]
+Policy = Callable[[Game], Optional[Direction]]
+
+
+class HeadlessGame:
+    # Same simulation as Game.loop without a window, audio or frame limiter
+    def __init__(self, field_path: str = 'field/field.txt', size: Tuple[int, int] = (800, 600),
+                 tick_rate: int = 60, swarm: int = 0, seed: int = 0,
+                 ghosts: Sequence[str] = ('Red', 'Green', 'Blue', 'Yellow'), paths_per_tick: int = Paths_per_tick,
+                 trace_path: str = None):
+
+        self.game: Game = Game(w=size[0], h=size[1], headless=True, field_path=field_path,
+                               swarm=swarm, tick_rate=tick_rate, seed=seed, ghosts=ghosts,
+                               paths_per_tick=paths_per_tick, trace_path=trace_path)
+
+    @property
+    def is_over(self) -> bool:
+
+        return self.game.pacman.is_caught
+
+    def step(self, direction: Optional[Direction] = None) -> bool:
+
+        if direction is not None:
+            self.game.steer(direction)
+
+        self.game.move()
+
+        return not self.is_over
+
+    def run(self, ticks: int, inputs: Union[Dict[int, Direction], Policy, None] = None) -> Dict[str, int]:
+
+        for _ in range(ticks):
+
+            if callable(inputs):
+                direction = inputs(self.game)
+
+            elif inputs is not None:
+                direction = inputs.get(self.game.ticks)
+
+            else:
+                direction = None
+
+            if not self.step(direction):
+                break
+
+        return {
+            'ticks': self.game.ticks,
+            'score': self.game.pacman.score,
+            'level': self.game.level,
+            'ghosts eaten': self.game.ghosts_eaten,
+            'pellets left': self.game.field.consumables.left,
+            'caught': self.is_over
+        }
+
+
+def random_policy(seed: int = 0, every: int = 30) -> Policy:
+
+    rng = Random(seed)
+    directions = ((0, -1), (1, 0), (0, 1), (-1, 0))
+
+    def policy(game: Game) -> Optional[Direction]:
+
+        if game.ticks % every == 0:
+            return rng.choice(directions)
+
+        return None
+
+    return policy
+
+
+def pellet_policy(seed: int = 0, every: int = 8) -> Policy:
+
+    rng = Random(seed)
+    rows = []
+
+    def policy(game: Game) -> Optional[Direction]:
+
+        if game.ticks % every != 0:
+            return None
+
+        # Pacman can not pass the ghost door, so it counts as a wall here
+        if not rows:
+            rows.append(np.where(game.field.play_field == grid.FREE, 0, 1).tolist())
+
+        pos = tuple(game.pacman.field_pos)
+        flow = nav.FlowField(rows[0], pos)
+
+        distances = np.frombuffer(flow.distances, dtype=np.int32).reshape(game.field.play_field.shape)
+        reachable = game.field.consumables.present & (distances > 0)
+
+        if not reachable.any():
+            return None
+
+        nearest = np.argwhere(reachable & (distances == distances[reachable].min())).tolist()
+        y, x = rng.choice(nearest)
+
+        # Walk back from the pellet to the tile next to Pacman
+        step = (x, y)
+        while flow.distance(step) > 1:
+            step = flow.next_step(step)
+
+        return step[0] - pos[0], step[1] - pos[1]
+
+    return policy
+
+
+def lookahead_policy(seed: int = 0, every: int = 8, depth: int = 30) -> Policy:
+
+    rng = Random(seed)
+    directions = ((0, -1), (1, 0), (0, 1), (-1, 0))
+
+    def policy(game: Game) -> Optional[Direction]:
+
+        if game.ticks % every != 0:
+            return None
+
+        # Every direction is played out for depth ticks and rolled back,
+        # staying alive counts first, then the score on the way
+        start = game.snapshot()
+        outcomes = []
+
+        for direction in directions:
+
+            game.steer(direction)
+
+            for _ in range(depth):
+
+                game.move()
+
+                if game.pacman.is_caught:
+                    break
+
+            outcomes.append((not game.pacman.is_caught, game.pacman.score, rng.random(), direction))
+            game.restore(start)
+
+        return max(outcomes)[-1]
+
+    return policy
+
+
+Policies: Dict[str, Callable[[int], Policy]] = {
+    'random': random_policy,
+    'pellets': pellet_policy,
+    'lookahead': lookahead_policy
+}
+
+
+if __name__ == '__main__':
+
+    parser = ArgumentParser(description='Run headless games as fast as possible.')
+    parser.add_argument('--field', default='field/field.txt')
+    parser.add_argument('--ticks', type=int, default=10000)
+    parser.add_argument('--games', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--swarm', type=int, default=0, help='number of swarm ghosts, 0 keeps the classic four')
+    parser.add_argument('--trace', default=None, help='folder for per tick traces, one subfolder per game')
+    parser.add_argument('--paths-per-tick', type=int, default=Paths_per_tick,
+                        help='ghost replans per tick, 0 serves every replan at once')
+    args = parser.parse_args()
+
+    for i in range(args.games):
+
+        start = perf_counter()
+        headless = HeadlessGame(field_path=args.field, swarm=args.swarm, seed=args.seed + i,
+                                paths_per_tick=args.paths_per_tick or None,
+                                trace_path=os.path.join(args.trace, f'game_{i}') if args.trace else None)
+        result = headless.run(args.ticks, random_policy(args.seed + i))
+        headless.game.close()
+        elapsed = perf_counter() - start
+
+        print(f'Game {i}: {result}, {round(result["ticks"] / elapsed)} ticks/s.')
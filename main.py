@@ -1,9 +1,26 @@
-from typing import Dict, Tuple, List
+from typing import Dict, Tuple, List, Callable, Sequence, NamedTuple
+from collections import OrderedDict
+import os
 import pygame as pg
 from abc import ABC
 import funcs as f
+import grid
+import navigation as nav
+import planner as pl
+import topology as topo
+import fieldc
+import swarm as sw
+import collision as col
+import pellets as pel
+import profiler as prof
+import telemetry as tel
+import assets
+from camera import Camera
+import scheduler as sched
 from sys import exit
-from random import choice
+from argparse import ArgumentParser
+from random import Random
+from threading import Thread
 from time import perf_counter
 
 
@@ -17,93 +34,322 @@ Colors: Dict[str, Tuple[int]] = {
 }
 
 
+# Pacman sprite looks left, the angle turns it towards the direction
+Pacman_angles: Dict[Tuple[int, int], float] = {
+    (0, -1): -90.0,
+    (1, 0): 180.0,
+    (0, 1): 90.0,
+    (-1, 0): 0.0,
+    (0, 0): 0.0
+}
+
+
+# Side of the pre-rendered background chunks in tiles
+Chunk_tiles: int = 16
+
+
+# Ghost replans served per tick, the rest wait a tick on their old paths. Two keep
+# four ghosts turning together from costing four searches in one frame.
+Paths_per_tick: int = 2
+
+
+# Sprites in the sprites folder packed into the field atlas next to the tiles
+Entity_sprites: Tuple[str] = ('pacman', 'red_ghost', 'green_ghost', 'blue_ghost', 'yellow_ghost', 'weak_ghost')
+
+
+# Snapshots hold tuples and private copies only, one can be restored any number of times
+class PacmanState(NamedTuple):
+    field_pos: Tuple[int, int]
+    prev_pos: Tuple[int, int]
+    screen_pos: Tuple[float, float]
+    last_screen_pos: Tuple[float, float]
+    direction: Tuple[int, int]
+    direction_queue: Tuple[Tuple[int, int]]
+    can_eat_ghosts: bool
+    pu_start_time: float
+    is_caught: bool
+    score: int
+
+
+class GhostState(NamedTuple):
+    field_pos: Tuple[int, int]
+    screen_pos: Tuple[float, float]
+    last_screen_pos: Tuple[float, float]
+    velocity: float
+    direction: Tuple[int, int]
+    tar_pos: Tuple[int, int]
+    path: object
+    is_dead: bool
+    waiting: bool
+
+
+class GameState(NamedTuple):
+    ticks: int
+    rng: tuple
+    level: int
+    level_cleared: bool
+    ghosts_eaten: int
+    # The inputs list is only ever appended to, so it is shared up to input_count
+    inputs: List[Tuple[int, Tuple[int, int]]]
+    input_count: int
+    pellets: bytes
+    pacman: PacmanState
+    ghosts: Tuple[GhostState]
+    swarm: object
+    scheduler: tuple
+    trace_rows: int = 0
+
+
 class Field:
-    def __init__(self, window_size: Tuple[int], field_path: str, field_sprites_folder: str):
+    def __init__(self, window_size: Tuple[int], field_path: str, field_sprites_folder: str,
+                 tick_rate: int = 60, min_tile_size: int = 16, entity_sprites: Sequence[str] = (),
+                 track_changes: bool = True):
 
+        self.path_table: nav.NextHopTable = None
 
-        self.sprite_keys: Tuple[str] = tuple(
-            open(f'{field_sprites_folder}\\sprite_keys.txt').readline().split()
+        # Compiled fields come memory-mapped with spawns, pellets and tables ready
+        if field_path.endswith(fieldc.EXTENSION):
+
+            self.compiled: fieldc.CompiledField = fieldc.CompiledField(field_path)
+
+            self.sprite_keys: Tuple[str] = self.compiled.sprite_keys
+            self.tiles, self.play_field = self.compiled.tiles, self.compiled.play
+            self.tile_keys: Tuple[str] = self.compiled.tile_keys
+            self.spawns: List[Tuple[int, int]] = self.compiled.spawns
+            self.pellets: List[Tuple[int, int]] = self.compiled.pellets
+            self.path_table = self.compiled.path_table
+
+        else:
+
+            self.sprite_keys: Tuple[str] = fieldc.read_keys(field_sprites_folder, 'sprite_keys.txt')
+            self.wall_keys: Tuple[str] = fieldc.read_keys(field_sprites_folder, 'wall_keys.txt')
+
+            # Integer coded grids, tile_keys turns a tile code back into its sprite key
+            self.tiles, self.play_field, self.tile_keys = grid.read_grid(field_path, self.sprite_keys, self.wall_keys)
+
+        self.tile_codes: Dict[str, int] = grid.tile_codes(self.tile_keys)
+        self.height, self.width = self.tiles.shape
+
+        if not hasattr(self, 'compiled'):
+            self.spawns: List[Tuple[int, int]] = self.find_tiles(*fieldc.SPAWN_KEYS)
+            self.pellets: List[Tuple[int, int]] = self.find_tiles(*fieldc.PELLET_KEYS)
+
+        # Live pellet state, gameplay eats through it instead of reading tiles
+        self.consumables: pel.PelletIndex = pel.PelletIndex(
+            self.tiles.shape, {pos: self.tile_key(pos) for pos in self.pellets}
         )
 
+        # List view of play_field for per-cell loops in pathfinding
+        self.play_rows: List[List[int]] = self.play_field.tolist()
 
-        self.wall_keys: Tuple[str] = tuple(
-            open(f'{field_sprites_folder}\\wall_keys.txt').readline().split()
+        # Junctions, corridors, free tiles and connected components of the maze, built
+        # here so no ghost pays for them in a frame. Compiled fields only read them.
+        compiled = hasattr(self, 'compiled')
+        walkable = self.compiled.walkable() if compiled else grid.walkable_mask(self.play_field)
+
+        self.topology: topo.JunctionGraph = topo.JunctionGraph(
+            self.play_rows, walkable, grid.neighbour_counts(walkable),
+            buffer=self.compiled.topology if compiled else None
         )
 
+        if self.path_table is None:
+            # Compiled fields carry their walls, text ones read them through wall_keys
+            wall_keys = () if hasattr(self, 'compiled') else self.wall_keys
+            self.path_table = nav.NextHopTable.for_field(field_path, self.play_rows, wall_keys)
 
-        self.draw_field, self.play_field = f.read_field(field_path, self.wall_keys)
-        self.field_size = len(self.draw_field)
+        self.flow_fields: nav.FlowFieldCache = nav.FlowFieldCache(self.play_rows, size=8)
 
 
-        self.tile_size: int = round(min(window_size) / self.field_size)
+        # Fields too big to fit with min_tile_size tiles scroll behind the camera
+        self.tile_size: int = max(int(min(window_size[0] / self.width, window_size[1] / self.height)),
+                                  min_tile_size)
+        self.tick_rate: int = tick_rate
 
 
-        self.sprites: Dict[str, pg.Surface] = f.load_sprite_collection(
-            folder=field_sprites_folder, keys=self.sprite_keys,
-            size=(self.tile_size, self.tile_size)
-        )
+        # Tiles and entity sprites share one atlas per tile size, cached on disk
+        tile_paths = assets.sprite_paths(field_sprites_folder, self.sprite_keys)
+
+        self.atlas: assets.Atlas = assets.cached_atlas(tile_paths + list(entity_sprites),
+                                                       (self.tile_size, self.tile_size))
+        f.sprite_cache.add_atlas(self.atlas)
+
+        self.sprites: Dict[str, pg.Surface] = {key: self.atlas.get(path)
+                                               for key, path in zip(self.sprite_keys, tile_paths)}
+
+        # The field is centered on the axes it fits on, rectangular fields leave bars on two sides
+        self.offset: Tuple[int, int] = (max((window_size[0] - self.width * self.tile_size) // 2, 0),
+                                        max((window_size[1] - self.height * self.tile_size) // 2, 0))
 
-        self.horizontal_centering = window_size[0] > window_size[1]
-        self.alignment_offset = (max(window_size) - self.field_size * self.tile_size) // 2
+        self.camera: Camera = Camera(tuple(window_size), (
+            max(window_size[0], self.width * self.tile_size), max(window_size[1], self.height * self.tile_size)
+        ))
+
+
+        # Static maze layer in square chunks, rendered when they first come into
+        # view and dropped least recently used. Tiles are repainted in set_tile.
+        self.chunk_size: int = Chunk_tiles * self.tile_size
+        self.chunks: OrderedDict = OrderedDict()
+        self.max_chunks: int = 2 * (window_size[0] // self.chunk_size + 2) * (window_size[1] // self.chunk_size + 2)
+
+        self.tile_sprites: List[pg.Surface] = [self.sprites.get(key) for key in self.tile_keys]
+
+        # Screen rects of repainted tiles, collected by the dirty rect renderer.
+        # Without a renderer nothing collects them, so they are not kept.
+        self.track_changes: bool = track_changes
+        self.changed_tiles: List[pg.Rect] = []
+
+        self.consumables.subscribe(self.__repaint_pellet)
+
+    def __chunk(self, cx: int, cy: int) -> pg.Surface:
+
+        if (cx, cy) in self.chunks:
+
+            self.chunks.move_to_end((cx, cy))
+
+            return self.chunks[(cx, cy)]
+
+        chunk = pg.Surface((self.chunk_size, self.chunk_size))
+        chunk.fill(Colors['Black'])
+
+        rows = self.tiles[cy * Chunk_tiles:(cy + 1) * Chunk_tiles, cx * Chunk_tiles:(cx + 1) * Chunk_tiles]
+
+        for i, row in enumerate(rows.tolist()):
+            for j, code in enumerate(row):
+
+                if self.tile_sprites[code] is not None:
+                    chunk.blit(self.tile_sprites[code], (j * self.tile_size, i * self.tile_size))
+
+        self.chunks[(cx, cy)] = chunk
+
+        if len(self.chunks) > self.max_chunks:
+            self.chunks.popitem(last=False)
+
+        return chunk
+
+    def __blit_chunks(self, screen: pg.Surface, view: pg.Rect) -> None:
+
+        # view is in world pixels, only the chunks overlapping it are drawn
+        left, top = view.left - self.offset[0], view.top - self.offset[1]
+
+        for cy in range(max(top // self.chunk_size, 0),
+                        min((top + view.height - 1) // self.chunk_size + 1, -(-self.height // Chunk_tiles))):
+            for cx in range(max(left // self.chunk_size, 0),
+                            min((left + view.width - 1) // self.chunk_size + 1, -(-self.width // Chunk_tiles))):
+
+                screen.blit(self.__chunk(cx, cy), self.camera.to_screen(
+                    (self.offset[0] + cx * self.chunk_size, self.offset[1] + cy * self.chunk_size)
+                ))
 
     def draw(self, screen: pg.Surface) -> None:
 
-        if self.horizontal_centering:
+        self.__blit_chunks(screen, self.camera.view)
 
-            for i, row in enumerate(self.draw_field):
-                for j in range(len(row)):
+    def tile_key(self, pos: Tuple[int, int]) -> str:
 
-                    try:
+        return self.tile_keys[self.tiles[pos[1], pos[0]]]
 
-                        screen.blit(self.sprites[self.draw_field[i][j]],
-                                    (self.alignment_offset + j * self.tile_size, i * self.tile_size))
+    def find_tiles(self, *keys: str) -> List[Tuple[int, int]]:
 
-                    except BaseException:
+        return grid.find_tiles(self.tiles, (self.tile_codes[key] for key in keys if key in self.tile_codes))
 
-                        pass
+    def find_walkable(self) -> List[Tuple[int, int]]:
 
-        else:
+        return grid.mask_positions(self.play_field == grid.FREE)
 
-            for i, row in enumerate(self.draw_field):
-                for j in range(len(row)):
+    def set_tile(self, pos: Tuple[int, int], key: str) -> None:
 
-                    try:
+        self.tiles[pos[1], pos[0]] = self.tile_codes[key]
 
-                        screen.blit(self.sprites[self.draw_field[i][j]],
-                                    (j * self.tile_size, self.alignment_offset + i * self.tile_size))
+        chunk = self.chunks.get((pos[0] // Chunk_tiles, pos[1] // Chunk_tiles))
 
-                    except BaseException:
+        # Chunks not rendered yet pick the new tile up when they are
+        if chunk is not None:
 
-                        pass
+            tile = pg.Rect(pos[0] % Chunk_tiles * self.tile_size, pos[1] % Chunk_tiles * self.tile_size,
+                           self.tile_size, self.tile_size)
 
-    def get_screen_pos(self, row: int, col: int) -> Tuple[int]:
+            chunk.fill(Colors['Black'], tile)
 
-        if self.horizontal_centering:
+            if key in self.sprites:
+                chunk.blit(self.sprites[key], tile)
 
-            return (self.alignment_offset + col * self.tile_size, row * self.tile_size)
+        if self.track_changes:
+            self.changed_tiles.append(pg.Rect(self.get_screen_pos(pos[1], pos[0]), (self.tile_size, self.tile_size)))
 
-        else:
+    def __repaint_pellet(self, event: pel.PelletEvent) -> None:
+
+        match event.kind:
+
+            case pel.PELLET_EATEN:
+
+                self.set_tile(event.pos, 'em')
+
+            case pel.PELLET_RESPAWNED:
+
+                self.set_tile(event.pos, event.key)
+
+    def take_changed_tiles(self) -> List[pg.Rect]:
 
-            return (col * self.tile_size, self.alignment_offset + row * self.tile_size)
+        changed, self.changed_tiles = self.changed_tiles, []
+
+        return changed
+
+    def restore(self, screen: pg.Surface, rect: pg.Rect) -> None:
+
+        clip = screen.get_clip()
+
+        screen.fill(Colors['Black'], rect)
+        screen.set_clip(rect)
+
+        self.__blit_chunks(screen, rect.move(self.camera.pos))
+
+        screen.set_clip(clip)
+
+    def find_path(self, begin: Tuple[int, int], end: Tuple[int, int]) -> Tuple[List[Tuple[int, int]], int]:
+
+        if self.path_table is not None:
+
+            return self.path_table.find_path(begin, end)
+
+        return f.Astar(field=self.play_rows, begin=begin, end=end)
+
+    def speed(self, v: float) -> float:
+
+        # Tiles per second to pixels per simulation tick
+        return v * self.tile_size / self.tick_rate
+
+    def get_world_pos(self, row: int, col: int) -> Tuple[int]:
+
+        # Pixels on the whole field, the space entities move and collide in
+        return (self.offset[0] + col * self.tile_size, self.offset[1] + row * self.tile_size)
+
+    def get_screen_pos(self, row: int, col: int) -> Tuple[int]:
+
+        return self.camera.to_screen(self.get_world_pos(row, col))
 
 
 class Pacman:
     def __init__(self, size: int, sprite_folder: str, field: Field,
-                 field_pos: Tuple[int], v: float):
+                 field_pos: Tuple[int], v: float, clock: Callable[[], float] = perf_counter):
 
         self.size: Tuple[int] = (size, size)
-        self.sprite: pg.Surface = f.surf_import(f'{sprite_folder}\pacman.png', self.size)
+        self.sprites: Dict[Tuple[int, int], pg.Surface] = f.sprite_cache.rotated(
+            os.path.join(sprite_folder, 'pacman.png'), self.size, Pacman_angles
+        )
 
         self.field: Field = field
         self.field_pos: List[int] = list(field_pos)
         self.prev_pos: List[int] = list(field_pos)
-        self.screen_pos: List[int] = field.get_screen_pos(field_pos[1], field_pos[0])
-        self.velocity: float = v
+        self.screen_pos: List[int] = field.get_world_pos(field_pos[1], field_pos[0])
+        self.last_screen_pos: List[int] = list(self.screen_pos)
+        self.velocity: float = field.speed(v)
         self.direction: List[int] = [0, 0]
         self.direction_queue: List[Tuple[int]] = []
 
+        self.clock: Callable[[], float] = clock
         self.can_eat_ghosts: bool = False
         self.pu_start_time: int = 0
+        self.is_caught: bool = False
 
         self.score: int = 0
 
@@ -123,7 +369,7 @@ class Pacman:
 
             new_field_pos = f.vec_sum(direction, self.field_pos)
 
-            if self.field.play_field[new_field_pos[1]][new_field_pos[0]] == 0:
+            if self.field.play_field[new_field_pos[1], new_field_pos[0]] == 0:
                 self.direction = list(direction)
 
         else:
@@ -150,14 +396,14 @@ class Pacman:
 
         if len(self.direction_queue) == 1:
 
-            tile_sc_pos = self.field.get_screen_pos(self.field_pos[1], self.field_pos[0])
+            tile_sc_pos = self.field.get_world_pos(self.field_pos[1], self.field_pos[0])
 
             if abs(self.screen_pos[0] - tile_sc_pos[0]) < self.velocity and \
                     abs(self.screen_pos[1] - tile_sc_pos[1]) < self.velocity:
 
                 new_f_pos = f.vec_sum(self.direction_queue[0], self.field_pos)
 
-                if self.field.play_field[new_f_pos[1]][new_f_pos[0]] == 0:
+                if self.field.play_field[new_f_pos[1], new_f_pos[0]] == 0:
                     self.direction = list(self.direction_queue[0])
                     self.direction_queue.pop(0)
 
@@ -172,7 +418,7 @@ class Pacman:
     def __check_position(self) -> None:
 
         new_field_pos = f.vec_sum(self.direction, self.field_pos)
-        new_screen_pos = self.field.get_screen_pos(new_field_pos[1], new_field_pos[0])
+        new_screen_pos = self.field.get_world_pos(new_field_pos[1], new_field_pos[0])
 
         in_new_tile = False
 
@@ -200,19 +446,15 @@ class Pacman:
             self.field_pos = list(new_field_pos)
             self.screen_pos = list(new_screen_pos)
 
-            match self.field.draw_field[new_field_pos[1]][new_field_pos[0]]:
+            match self.field.consumables.eat(new_field_pos):
 
                 case 'pu':
 
-                    self.field.draw_field[new_field_pos[1]][new_field_pos[0]] = 'em'
-
                     self.can_eat_ghosts = True
-                    self.pu_start_time = perf_counter()
+                    self.pu_start_time = self.clock()
 
                 case 'f':
 
-                    self.field.draw_field[new_field_pos[1]][new_field_pos[0]] = 'em'
-
                     self.score += 100
 
                 case _:
@@ -221,7 +463,7 @@ class Pacman:
 
     def __check_powerup(self):
 
-        if perf_counter() - self.pu_start_time >= 5:
+        if self.clock() - self.pu_start_time >= 5:
             self.can_eat_ghosts = False
 
     def move(self) -> None:
@@ -233,51 +475,57 @@ class Pacman:
 
         new_field_pos = f.vec_sum(self.direction, self.field_pos)
 
-        if self.field.play_field[new_field_pos[1]][new_field_pos[0]] == 0:
+        if self.field.play_field[new_field_pos[1], new_field_pos[0]] == 0:
             self.screen_pos = [self.screen_pos[0] + self.direction[0] * self.velocity,
                                self.screen_pos[1] + self.direction[1] * self.velocity]
 
-    def draw(self, screen: pg.Surface) -> None:
-
-        phi: float = .0
+    def snapshot(self) -> PacmanState:
 
-        match self.direction:
+        return PacmanState(tuple(self.field_pos), tuple(self.prev_pos), tuple(self.screen_pos),
+                           tuple(self.last_screen_pos), tuple(self.direction), tuple(self.direction_queue),
+                           self.can_eat_ghosts, self.pu_start_time, self.is_caught, self.score)
 
-            case [0, -1]:
-                phi = -90.0
+    def restore(self, state: PacmanState) -> None:
 
-            case [1, 0]:
-                phi = 180.0
+        self.field_pos = list(state.field_pos)
+        self.prev_pos = list(state.prev_pos)
+        self.screen_pos = list(state.screen_pos)
+        self.last_screen_pos = list(state.last_screen_pos)
+        self.direction = list(state.direction)
+        self.direction_queue = list(state.direction_queue)
+        self.can_eat_ghosts = state.can_eat_ghosts
+        self.pu_start_time = state.pu_start_time
+        self.is_caught = state.is_caught
+        self.score = state.score
 
-            case [0, -1]:
-                phi = 90.0
+    def render_pos(self, alpha: float) -> Tuple[float, float]:
 
-            case [-1, 0]:
-                phi = 0.0
-
-            case _:
+        return f.lerp(self.last_screen_pos, self.screen_pos, alpha)
 
-                pass
+    def draw(self, screen: pg.Surface, alpha: float = 1.0) -> None:
 
-        screen.blit(
-            pg.transform.rotate(self.sprite, phi), tuple(self.screen_pos)
-        )
+        screen.blit(self.sprites[tuple(self.direction)], self.field.camera.to_screen(self.render_pos(alpha)))
 
 
 class Ghost(ABC):
     def __init__(self, color: str, sprite_folder: str, size: int, field: Field,
-                 field_pos: Tuple[int, int], v: float, target: Pacman):
+                 field_pos: Tuple[int, int], v: float, target: Pacman, rng: Random = None):
 
         self.size: Tuple[int, int] = (size, size)
-        self.sprite: pg.Surface = f.surf_import(path=f'{sprite_folder}\{color}_ghost.png', size=self.size)
-        self.alt_sprite: pg.Surface = f.surf_import(path=f'{sprite_folder}\weak_ghost.png', size=self.size)
+        # Animation frames per ghost state, add more paths to animate
+        self.frames: Dict[str, Tuple[pg.Surface]] = {
+            'normal': f.sprite_cache.frames((os.path.join(sprite_folder, f'{color}_ghost.png'),), self.size),
+            'frightened': f.sprite_cache.frames((os.path.join(sprite_folder, 'weak_ghost.png'),), self.size)
+        }
+        self.frame: int = 0
 
         self.field: Field = field
         self.spawn_field_pos: Tuple[int, int] = field_pos
         self.field_pos: List[int] = list(field_pos)
-        self.screen_pos: List[int] = list(field.get_screen_pos(field_pos[1], field_pos[0]))
-        self.velocity: float = v
-        self.alt_v: float = v / 2
+        self.screen_pos: List[int] = list(field.get_world_pos(field_pos[1], field_pos[0]))
+        self.last_screen_pos: List[int] = list(self.screen_pos)
+        self.velocity: float = field.speed(v)
+        self.alt_v: float = self.velocity / 2
         self.direction: List[int] = [0, 0]
 
         self.target: Pacman = target
@@ -285,15 +533,46 @@ class Ghost(ABC):
         self.path: List[Tuple[int, int]] = []
         self.is_dead = False
 
-    def draw(self, screen: pg.Surface) -> None:
+        # Game hands in a PathScheduler, waiting is set while a replan is queued
+        self.scheduler = None
+        self.waiting: bool = False
 
-        if not self.target.can_eat_ghosts:
+        # Random choices go through rng, a seeded one makes the ghost reproducible
+        self.rng: Random = rng if rng is not None else Random()
 
-            screen.blit(self.sprite, tuple(self.screen_pos))
+        # Without a next-hop table every ghost repairs its own search trees,
+        # a target moving by a tile then costs a few expansions, not a search
+        self.planner = field if field.path_table is not None else pl.IncrementalPlanner(field.play_rows)
 
-        else:
+    def snapshot(self) -> GhostState:
+
+        # Paths are popped as the ghost walks, so the snapshot keeps its own copy
+        return GhostState(tuple(self.field_pos), tuple(self.screen_pos), tuple(self.last_screen_pos), self.velocity,
+                          tuple(self.direction), tuple(self.tar_pos), self.path.copy(), self.is_dead, self.waiting)
+
+    def restore(self, state: GhostState) -> None:
 
-            screen.blit(self.alt_sprite, tuple(self.screen_pos))
+        self.field_pos = list(state.field_pos)
+        self.screen_pos = list(state.screen_pos)
+        self.last_screen_pos = list(state.last_screen_pos)
+        self.velocity = state.velocity
+        self.direction = list(state.direction)
+        self.tar_pos = list(state.tar_pos)
+        self.path = state.path.copy()
+        self.is_dead = state.is_dead
+        self.waiting = state.waiting
+
+    def render_pos(self, alpha: float) -> Tuple[float, float]:
+
+        return f.lerp(self.last_screen_pos, self.screen_pos, alpha)
+
+    def draw(self, screen: pg.Surface, alpha: float = 1.0) -> None:
+
+        frames = self.frames['frightened' if self.target.can_eat_ghosts else 'normal']
+
+        self.frame += 1
+
+        screen.blit(frames[self.frame // 8 % len(frames)], self.field.camera.to_screen(self.render_pos(alpha)))
 
     def _get_tar_pos(self) -> List[int]:
         pass
@@ -301,44 +580,70 @@ class Ghost(ABC):
     def _get_dir(self) -> None:
         self.direction = list(f.get_dir(self.field_pos, self.path[0]))
 
-    def _update_path(self) -> None:
+    def path_request(self) -> Tuple[Tuple[int, int], Tuple[int, int], Tuple[int, int], bool]:
 
-        sc_pos = self.field.get_screen_pos(self.field_pos[0], self.field_pos[1])
+        sc_pos = self.field.get_world_pos(self.field_pos[0], self.field_pos[1])
 
-        if abs(self.screen_pos[0] - sc_pos[0]) < self.velocity and \
-                abs(self.screen_pos[1] - sc_pos[1]) < self.velocity:
+        centered = abs(self.screen_pos[0] - sc_pos[0]) < self.velocity and \
+            abs(self.screen_pos[1] - sc_pos[1]) < self.velocity
 
-            self.path = f.Astar(
-                field=self.field.play_field, begin=tuple(self.field_pos), end=tuple(self.tar_pos)
-            )[0]
+        return tuple(self.field_pos), tuple(self.direction), tuple(self.tar_pos), centered
 
-        else:
+    def search_path(self, request: Tuple[Tuple[int, int], Tuple[int, int], Tuple[int, int], bool]) \
+            -> Tuple[List[Tuple[int, int]], bool]:
 
-            path1, cost1 = f.Astar(
-                field=self.field.play_field, begin=tuple(self.field_pos), end=tuple(self.tar_pos)
-            )
-            path2, cost2 = f.Astar(
-                field=self.field.play_field, end=tuple(self.tar_pos),
-                begin=f.vec_sum(self.field_pos, self.direction)
-            )
+        # Only reads the request and the planner, so it may run on a worker thread
+        field_pos, direction, tar_pos, centered = request
 
-            if cost1 > cost2:
+        if centered:
 
-                self.path = path2
+            return self.planner.find_path(begin=field_pos, end=tar_pos)[0], False
 
-            else:
+        path1, cost1 = self.planner.find_path(
+            begin=field_pos, end=tar_pos
+        )
+        path2, cost2 = self.planner.find_path(
+            end=tar_pos,
+            begin=f.vec_sum(field_pos, direction)
+        )
+
+        if cost1 > cost2:
 
-                self.path = path1
+            return path2, False
 
-                self.field_pos = list(f.vec_sum(self.field_pos, self.direction))
+        return path1, True
 
-        if list(self.path[0]) == self.field_pos:
+    def apply_path(self, path: List[Tuple[int, int]], advance: bool) -> None:
+
+        self.path = path
+
+        if advance:
+            self.field_pos = list(f.vec_sum(self.field_pos, self.direction))
+
+        if len(self.path) != 0 and list(self.path[0]) == self.field_pos:
             self.path.pop(0)
 
+        # Nothing left to walk when the ghost already stands on its target
+        if len(self.path) != 0:
+            self._get_dir()
+        else:
+            self.direction = [0, 0]
+
+    def replan(self) -> None:
+
+        self.apply_path(*self.search_path(self.path_request()))
+
+    def _update_path(self) -> None:
+
+        if self.scheduler is not None:
+            self.scheduler.request(self)
+        else:
+            self.replan()
+
     def _check_pos(self) -> None:
 
         new_pos = f.vec_sum(self.field_pos, self.direction)
-        new_sc_pos = self.field.get_screen_pos(new_pos[1], new_pos[0])
+        new_sc_pos = self.field.get_world_pos(new_pos[1], new_pos[0])
 
         in_new_tile = False
 
@@ -369,32 +674,15 @@ class Ghost(ABC):
                 self.is_dead = False
                 self.direction = [0, 0]
 
-    def _check_collision(self) -> None:
-
-        collides: bool = False
-
-        collides = (self.target.screen_pos[0] + self.target.size[0] > self.screen_pos[0] and \
-                    self.target.screen_pos[0] < self.screen_pos[0] + self.size[0]) and \
-                   (self.target.screen_pos[1] + self.target.size[1] > self.screen_pos[1] and \
-                    self.target.screen_pos[1] < self.screen_pos[1] + self.size[1])
-
-        if collides:
-
-            if self.target.can_eat_ghosts and not self.is_dead:
+    def die(self) -> None:
 
-                self.velocity = self.alt_v * 10
-                self.target.score += 1000
-                self.is_dead = True
-
-            elif not self.target.can_eat_ghosts:
-
-                exit('game over')
+        self.velocity = self.alt_v * 10
+        self.is_dead = True
 
     def move(self) -> None:
 
         # Assisting funcs
         self._check_pos()
-        self._check_collision()
 
         if not self.target.can_eat_ghosts:
 
@@ -406,8 +694,6 @@ class Ghost(ABC):
 
                 self._update_path()
 
-                self._get_dir()
-
         else:
 
             if self.tar_pos != list(self.spawn_field_pos):
@@ -416,8 +702,6 @@ class Ghost(ABC):
 
                 self._update_path()
 
-                self._get_dir()
-
                 self.velocity = self.alt_v
 
         self.screen_pos = [self.screen_pos[0] + self.direction[0] * self.velocity,
@@ -426,10 +710,10 @@ class Ghost(ABC):
 
 class RedGhost(Ghost):
     def __init__(self, sprite_folder: str, size: int, field: Field,
-                 field_pos: Tuple[int, int], v: float, target: Pacman):
+                 field_pos: Tuple[int, int], v: float, target: Pacman, rng: Random = None):
         super().__init__(
             color='red', sprite_folder=sprite_folder, size=size,
-            field=field, field_pos=field_pos, v=v, target=target
+            field=field, field_pos=field_pos, v=v, target=target, rng=rng
         )
 
     def _get_tar_pos(self) -> List[int]:
@@ -438,10 +722,10 @@ class RedGhost(Ghost):
 
 class GreenGhost(Ghost):
     def __init__(self, sprite_folder: str, size: int, field: Field,
-                 field_pos: Tuple[int, int], v: float, target: Pacman):
+                 field_pos: Tuple[int, int], v: float, target: Pacman, rng: Random = None):
         super().__init__(
             color='green', sprite_folder=sprite_folder, size=size,
-            field=field, field_pos=field_pos, v=v, target=target
+            field=field, field_pos=field_pos, v=v, target=target, rng=rng
         )
 
     def _get_tar_pos(self) -> List[int]:
@@ -450,18 +734,18 @@ class GreenGhost(Ghost):
 
 class BlueGhost(Ghost):
     def __init__(self, sprite_folder: str, size: int, field: Field,
-                 field_pos: Tuple[int, int], v: float, target: Pacman):
+                 field_pos: Tuple[int, int], v: float, target: Pacman, rng: Random = None):
 
         super().__init__(
             color='blue', sprite_folder=sprite_folder, size=size,
-            field=field, field_pos=field_pos, v=v, target=target
+            field=field, field_pos=field_pos, v=v, target=target, rng=rng
         )
 
     def _get_tar_pos(self) -> List[int]:
 
         pot_pos: Tuple[int, int] = f.vec_sum(self.target.field_pos, self.target.direction)
 
-        if self.field.play_field[pot_pos[1]][pot_pos[0]] == 0:
+        if self.field.play_field[pot_pos[1], pot_pos[0]] == 0:
 
             return list(pot_pos)
 
@@ -473,13 +757,13 @@ class BlueGhost(Ghost):
 
                 new_pos: Tuple[int, int] = f.vec_sum(self.target.field_pos, adj)
 
-                if self.field.play_field[new_pos[1]][new_pos[0]] == 0 and \
+                if self.field.play_field[new_pos[1], new_pos[0]] == 0 and \
                         self.direction != f.neg_dir(adj):
                     potentials.append(new_pos)
 
         if len(potentials) != 0:
 
-            return choice(potentials)
+            return self.rng.choice(potentials)
 
         else:
 
@@ -488,33 +772,31 @@ class BlueGhost(Ghost):
 
 class YellowGhost(Ghost):
     def __init__(self, sprite_folder: str, size: int, field: Field,
-                 field_pos: Tuple[int, int], v: float, target: Pacman):
+                 field_pos: Tuple[int, int], v: float, target: Pacman, rng: Random = None):
 
         super().__init__(
             color='yellow', sprite_folder=sprite_folder, size=size,
-            field=field, field_pos=field_pos, v=v, target=target
+            field=field, field_pos=field_pos, v=v, target=target, rng=rng
         )
 
-    def _get_tar_pos(self) -> List[int]:
+        # Random targets jump across the maze, a junction graph search beats
+        # growing one search tree towards each of them
+        if field.path_table is None:
+            self.planner = field.topology
 
-        pos_x: int = 0
-        pos_y: int = 0
+    def _get_tar_pos(self) -> List[int]:
 
-        while self.field.play_field[pos_y][pos_x] != 0:
-            pos_y = choice(range(len(self.field.play_field)))
-            pos_x = choice(range(len(self.field.play_field[0])))
+        target = self.field.topology.random_target(self.rng, self.field_pos)
 
-        self.tar_pos = [pos_x, pos_y]
+        self.tar_pos = list(target) if target is not None else list(self.field_pos)
 
         self._update_path()
-        self._get_dir()
 
         return self.tar_pos
 
     def move(self) -> None:
 
         self._check_pos()
-        self._check_collision()
 
         if not self.target.can_eat_ghosts:
 
@@ -526,7 +808,7 @@ class YellowGhost(Ghost):
 
                 self._get_tar_pos()
 
-            elif self.direction == [0, 0]:
+            elif self.direction == [0, 0] and not self.waiting:
                 self._get_tar_pos()
 
         else:
@@ -536,66 +818,119 @@ class YellowGhost(Ghost):
 
                 self._update_path()
 
-                self._get_dir()
-
                 self.velocity = self.alt_v
 
         self.screen_pos = [self.screen_pos[0] + self.direction[0] * self.velocity,
                            self.screen_pos[1] + self.direction[1] * self.velocity]
 
 
+Ghost_types: Dict[str, type] = {
+    'Red': RedGhost,
+    'Green': GreenGhost,
+    'Blue': BlueGhost,
+    'Yellow': YellowGhost
+}
+
+
 class Game:
-    def __init__(self, w: int = 800, h: int = 600, fps: int = 60):
+    def __init__(self, w: int = 800, h: int = 600, fps: int = 60, dirty_rects: bool = False,
+                 headless: bool = False, field_path: str = 'field/field.txt', swarm: int = 0,
+                 tick_rate: int = 60, profile_path: str = None, seed: int = 0,
+                 ghosts: Sequence[str] = ('Red', 'Green', 'Blue', 'Yellow'), paths_per_tick: int = Paths_per_tick,
+                 path_budget_ms: float = None, path_workers: int = 0, min_tile_size: int = 16,
+                 trace_path: str = None):
+
+        # Time to first frame counts from here to the end of the first flip
+        self.created: float = perf_counter()
+        self.first_frame_ms: float = None
 
         self.size: Tuple[int, int] = (w, h)
+        # fps only caps rendering, the simulation always runs tick_rate ticks per second
         self.fps: int = fps
+        self.tick_rate: int = tick_rate
+        self.dirty_rects: bool = dirty_rects
+        self.headless: bool = headless
+        self.full_redraw: bool = True
+        self.prev_rects: List[pg.Rect] = []
+
+        # Sprites still need a display mode to convert, headless runs get an offscreen one
+        if headless:
+            os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
         self.sc = pg.display.set_mode(self.size)
         self.clock = pg.time.Clock()
         self.is_on: bool = True
+        self.ticks: int = 0
+
+        # Everything random draws from the seed and time is counted in ticks,
+        # so the seed and the logged inputs reproduce a whole session
+        self.field_path: str = field_path
+        self.seed: int = seed
+        self.rng: Random = Random(seed)
+        self.inputs: List[Tuple[int, Tuple[int, int]]] = []
+
+        # Per phase frame timings, F3 shows them, profile_path streams them to JSON lines or CSV
+        self.profiler = prof.FrameProfiler(stream_path=profile_path)
+        self.overlay_rect: pg.Rect = None
 
         self.score: int = 0
+        self.ghosts_eaten: int = 0
+        self.level: int = 1
+        self.level_cleared: bool = False
+
+        # Music is not needed for the first frame, it starts streaming after it
+        self.music: Thread = None
 
-        pg.mixer.init()
-        pg.mixer.music.load('sprites/music.mp3')
-        pg.mixer.music.play(-1)
         self.field = Field(
-            window_size=self.size, field_path='field/field.txt', field_sprites_folder='sprites/field_sprites'
+            window_size=self.size, field_path=field_path, field_sprites_folder='sprites/field_sprites',
+            tick_rate=tick_rate, min_tile_size=min_tile_size,
+            entity_sprites=assets.sprite_paths('sprites', Entity_sprites), track_changes=not headless
         )
 
         self.pacman = Pacman(
             size=self.field.tile_size, sprite_folder='sprites', field=self.field,
-            field_pos=(1, 2), v=2
+            field_pos=(1, 2), v=4, clock=self.sim_time
         )
 
-        spawns: List[List[int]] = []
-        for row in range(len(self.field.draw_field)):
-            for col in range(len(self.field.draw_field[row])):
-                if self.field.draw_field[row][col] == 'gh':
-                    self.field.draw_field[row][col] = 'em'
-                    spawns.append((col, row))
+        spawns: List[Tuple[int, int]] = self.field.spawns
+        for spawn in spawns:
+            self.field.set_tile(spawn, 'em')
 
-        self.ghosts: Dict[str, Ghost] = {
-            'Red': RedGhost(
-                sprite_folder='sprites', size=self.field.tile_size,
-                field=self.field, field_pos=spawns[0], v=1, target=self.pacman
-            ),
+        self.field.consumables.subscribe(self.__on_pellet)
 
-            'Green': GreenGhost(
-                sprite_folder='sprites', size=self.field.tile_size,
-                field=self.field, field_pos=spawns[1], v=1, target=self.pacman
-            ),
+        # Swarm mode replaces the four ghost objects with packed arrays
+        self.swarm: sw.GhostSwarm = None
 
-            'Blue': BlueGhost(
-                sprite_folder='sprites', size=self.field.tile_size,
-                field=self.field, field_pos=spawns[2], v=1, target=self.pacman
-            ),
+        if swarm > 0:
+            self.swarm = sw.GhostSwarm(field=self.field, spawns=spawns, count=swarm,
+                                       sprite_folder='sprites', v=2, seed=seed)
+
+        self.collisions = col.CollisionSystem(self.field.tile_size, self.field.get_world_pos(0, 0))
+        self.collisions.add_rule(Pacman, Ghost, self.__pacman_meets_ghost)
+        self.events: List[col.CollisionEvent] = []
 
-            'Yellow': YellowGhost(
+        # ghosts picks the classic ghosts by name, spawns are handed out in order
+        self.ghosts: Dict[str, Ghost] = {} if swarm > 0 else {
+            name: Ghost_types[name](
                 sprite_folder='sprites', size=self.field.tile_size,
-                field=self.field, field_pos=spawns[3], v=1, target=self.pacman
+                field=self.field, field_pos=spawns[i % len(spawns)], v=2, target=self.pacman, rng=self.rng
             )
+            for i, name in enumerate(ghosts)
         }
 
+        # Replans beyond the per tick budget wait for a later tick, nearest ghosts first
+        self.scheduler = sched.PathScheduler(
+            max_paths=paths_per_tick, budget_ms=path_budget_ms, workers=path_workers,
+            priority=lambda ghost: f.grid_dist(ghost.field_pos, self.pacman.field_pos)
+        )
+
+        for ghost in self.ghosts.values():
+            ghost.planner = prof.ProfiledPlanner(ghost.planner, self.profiler)
+            ghost.scheduler = self.scheduler
+
+        # trace_path gets a columnar trace with one row per tick, see telemetry.Trace
+        self.trace: tel.TickRecorder = tel.TickRecorder(self, trace_path) if trace_path else None
+
     def process_events(self, events: List[pg.event.Event]) -> None:
 
         for event in events:
@@ -612,75 +947,311 @@ class Game:
 
                         case pg.K_w | pg.K_UP:
 
-                            self.pacman.change_dir((0, -1))
+                            self.steer((0, -1))
 
                         case pg.K_a | pg.K_LEFT:
 
-                            self.pacman.change_dir((-1, 0))
+                            self.steer((-1, 0))
 
                         case pg.K_s | pg.K_DOWN:
 
-                            self.pacman.change_dir((0, 1))
+                            self.steer((0, 1))
 
                         case pg.K_d | pg.K_RIGHT:
 
-                            self.pacman.change_dir((1, 0))
+                            self.steer((1, 0))
+
+                        case pg.K_F3:
+
+                            self.profiler.toggle_overlay()
+                            self.full_redraw = True
 
                         case _:
 
                             pass
 
+    def steer(self, direction: Tuple[int, int]) -> None:
+
+        self.inputs.append((self.ticks, direction))
+        self.pacman.change_dir(direction)
+
+    def __pacman_meets_ghost(self, pacman: Pacman, ghost: Ghost) -> str:
+
+        if pacman.can_eat_ghosts and not ghost.is_dead:
+            return col.GHOST_EATEN
+
+        if not pacman.can_eat_ghosts:
+            return col.PLAYER_CAUGHT
+
+        return None
+
+    def __apply_events(self) -> None:
+
+        for event in self.events:
+
+            match event.kind:
+
+                case col.GHOST_EATEN:
+
+                    if isinstance(event.other, Ghost):
+                        event.other.die()
+
+                    self.pacman.score += 1000
+                    self.ghosts_eaten += 1
+
+                case col.PLAYER_CAUGHT:
+
+                    self.pacman.is_caught = True
+
+    def __on_pellet(self, event: pel.PelletEvent) -> None:
+
+        # Pellets come back after the tick, not in the middle of Pacman.move
+        if event.kind == pel.LEVEL_CLEARED:
+            self.level_cleared = True
+
+    def sim_time(self) -> float:
+
+        return self.ticks / self.tick_rate
+
+    def snapshot(self) -> GameState:
+
+        # The maze itself never changes and eaten pellets are one bit per cell,
+        # so a snapshot costs about as much as the moving parts of the game
+        return GameState(
+            ticks=self.ticks, rng=self.rng.getstate(), level=self.level, level_cleared=self.level_cleared,
+            ghosts_eaten=self.ghosts_eaten, inputs=self.inputs, input_count=len(self.inputs),
+            pellets=self.field.consumables.snapshot(), pacman=self.pacman.snapshot(),
+            ghosts=tuple(ghost.snapshot() for ghost in self.ghosts.values()),
+            swarm=self.swarm.snapshot() if self.swarm is not None else None,
+            scheduler=self.scheduler.snapshot(), trace_rows=self.trace.rows if self.trace is not None else 0
+        )
+
+    def restore(self, state: GameState) -> None:
+
+        # Only for snapshots of this game, ghosts are matched by their order.
+        # Eaten and respawned pellets repaint their tiles through the pellet events.
+        self.ticks = state.ticks
+        self.rng.setstate(state.rng)
+        self.level = state.level
+        self.ghosts_eaten = state.ghosts_eaten
+        self.inputs = state.inputs[:state.input_count]
+
+        self.field.consumables.restore(state.pellets)
+        self.level_cleared = state.level_cleared
+
+        self.pacman.restore(state.pacman)
+
+        for ghost, ghost_state in zip(self.ghosts.values(), state.ghosts):
+            ghost.restore(ghost_state)
+
+        if self.swarm is not None:
+            self.swarm.restore(state.swarm)
+
+        self.scheduler.restore(state.scheduler)
+
+        # Rolled back ticks leave the trace too, it keeps the history that stayed
+        if self.trace is not None:
+            self.trace.rewind(state.trace_rows)
+
+        self.events = []
+        self.full_redraw = True
+
     def move(self):
 
-        self.pacman.move()
+        # Positions before the tick, rendering interpolates from them
+        for entity in (self.pacman, *self.ghosts.values()):
+            entity.last_screen_pos = list(entity.screen_pos)
+
+        with self.profiler.phase('Pacman.move'):
+            self.pacman.move()
+
+        with self.profiler.phase('path scheduler'):
+            self.scheduler.begin_tick()
+
+        for name, ghost in self.ghosts.items():
+            with self.profiler.phase(f'Ghost.move {name}'):
+                ghost.move()
+
+        with self.profiler.phase('collisions'):
+            self.events = self.collisions.update((self.pacman, *self.ghosts.values()))
+
+        if self.swarm is not None:
+            with self.profiler.phase('GhostSwarm.move'):
+                self.events += self.swarm.move(self.pacman)
 
-        for i, ghost in enumerate(self.ghosts.values()):
-            ghost.move()
+        self.__apply_events()
 
+        if self.level_cleared:
+            self.level += 1
+            self.level_cleared = False
+            self.field.consumables.respawn()
 
-    def draw(self) -> None:
+        if self.trace is not None:
+            with self.profiler.phase('telemetry'):
+                self.trace.record()
+
+        self.ticks += 1
+
+    def draw(self, alpha: float = 1.0) -> List[pg.Rect]:
+
+        # The camera keeps Pacman in the middle, a moving view repaints everything
+        pos = self.pacman.render_pos(alpha)
+
+        if self.field.camera.follow((pos[0] + self.pacman.size[0] / 2, pos[1] + self.pacman.size[1] / 2)):
+            self.full_redraw = True
+
+        if self.dirty_rects and not self.full_redraw:
+            return self.__draw_dirty(alpha)
+
+        self.full_redraw = False
+        self.field.take_changed_tiles()
 
         self.sc.fill(Colors['Black'])
 
         # Draw field
-        self.field.draw(self.sc)
+        with self.profiler.phase('Field.draw'):
+            self.field.draw(self.sc)
 
-        # Draw pacman
-        self.pacman.draw(self.sc)
+        self.__draw_sprites(alpha)
 
-        # Draw ghosts
-        for ghost in self.ghosts.values():
-            ghost.draw(self.sc)
+        self.prev_rects = self.__sprite_rects(alpha)
+        self.overlay_rect = self.profiler.draw_overlay(self.sc)
+
+        return []
+
+    def __draw_sprites(self, alpha: float) -> None:
+
+        with self.profiler.phase('sprites'):
+
+            # Draw pacman
+            self.pacman.draw(self.sc, alpha)
+
+            # Draw ghosts, the ones outside the view are skipped
+            for ghost in self.ghosts.values():
+                if self.field.camera.sees(ghost.render_pos(alpha), ghost.size):
+                    ghost.draw(self.sc, alpha)
+
+            if self.swarm is not None:
+                self.swarm.draw(self.sc, alpha)
+
+    def __sprite_rects(self, alpha: float) -> List[pg.Rect]:
+
+        camera = self.field.camera
+
+        rects = [pg.Rect(camera.to_screen(entity.render_pos(alpha)), entity.size)
+                 for entity in (self.pacman, *self.ghosts.values()) if camera.sees(entity.render_pos(alpha), entity.size)]
+
+        if self.swarm is not None:
+            rects += self.swarm.rects(alpha)
+
+        return rects
+
+    def __draw_dirty(self, alpha: float) -> List[pg.Rect]:
+
+        rects = self.__sprite_rects(alpha)
+        dirty = self.prev_rects + rects + self.field.take_changed_tiles()
+
+        if self.overlay_rect is not None:
+            dirty.append(self.overlay_rect)
+
+        # Restore the background under the old sprites and eaten pellets
+        with self.profiler.phase('Field.draw'):
+            for rect in dirty:
+                self.field.restore(self.sc, rect)
+
+        self.__draw_sprites(alpha)
+
+        self.prev_rects = rects
+        self.overlay_rect = self.profiler.draw_overlay(self.sc)
+
+        if self.overlay_rect is not None:
+            dirty.append(self.overlay_rect)
+
+        return dirty
+
+    def __first_frame(self) -> None:
+
+        self.first_frame_ms = (perf_counter() - self.created) * 1000
+        print(f'First frame after {round(self.first_frame_ms, 2)} ms.')
+
+        if not self.headless:
+            self.music = assets.stream_music('sprites/music.mp3')
 
     def loop(self) -> None:
 
-        performance_list: List[int] = []
+        tick_time: float = 1 / self.tick_rate
+        lag: float = 0.0
+        previous: float = perf_counter()
 
         while self.is_on:
 
-            events = pg.event.get()
-            self.process_events(events)
+            self.profiler.begin_frame()
 
-            self.move()
+            with self.profiler.phase('process_events'):
+                events = pg.event.get()
+                self.process_events(events)
 
-            self.draw()
+            # Fixed timestep: run as many ticks as the elapsed time needs,
+            # a very long frame is cut so the game pauses instead of racing
+            now = perf_counter()
+            lag += min(now - previous, .25)
+            previous = now
 
-            pg.display.flip()
-            self.clock.tick(self.fps)
+            while lag >= tick_time:
+
+                self.move()
+                lag -= tick_time
+
+                if self.pacman.is_caught:
+                    self.close()
+                    exit('game over')
+
+            dirty = self.draw(lag / tick_time)
+
+            with self.profiler.phase('display.flip'):
+                if self.dirty_rects and dirty:
+                    pg.display.update(dirty)
+                else:
+                    pg.display.flip()
+
+            if self.first_frame_ms is None:
+                self.__first_frame()
 
             if self.pacman.score != self.score:
                 pg.display.set_caption(str(self.pacman.score))
                 self.score = self.pacman.score
 
-            if len(performance_list) >= 60:
-                print(f'Average time for computing frame is '
-                      f'{round(sum(performance_list) / len(performance_list), 2)} ms.'
-                      )
+            # Frame time without the sleep in clock.tick
+            self.profiler.end_frame()
+
+            if self.profiler.frames % 60 == 0:
+                frame = self.profiler.percentiles('frame')
+                print(f'Frame time is p50 {round(frame["p50"], 2)} ms, '
+                      f'p95 {round(frame["p95"], 2)} ms, p99 {round(frame["p99"], 2)} ms.')
+
+            self.clock.tick(self.fps)
+
+        self.close()
+
+    def close(self) -> None:
+
+        self.profiler.close()
+        self.scheduler.close()
+
+        if self.trace is not None:
+            self.trace.close()
 
-                performance_list = []
 
-            performance_list.append(self.clock.get_time())
+if __name__ == '__main__':
 
+    parser = ArgumentParser(description='Play Pacman.')
+    parser.add_argument('--field', default='field/field.txt')
+    parser.add_argument('--paths-per-tick', type=int, default=Paths_per_tick,
+                        help='ghost replans per tick, 0 serves every replan at once')
+    parser.add_argument('--path-budget-ms', type=float, default=None, help='pathfinding milliseconds per tick')
+    parser.add_argument('--path-workers', type=int, default=0, help='threads searching ghost paths')
+    args = parser.parse_args()
 
-game = Game()
-game.loop()
+    game = Game(field_path=args.field, paths_per_tick=args.paths_per_tick or None, path_budget_ms=args.path_budget_ms,
+                path_workers=args.path_workers)
+    game.loop()
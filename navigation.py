@@ -0,0 +1,336 @@
+from typing import List, Sequence, Tuple, Optional
+from array import array
+from collections import deque, OrderedDict
+from hashlib import sha1
+import os
+import struct
+import funcs as f
+
+
+TABLE_MAGIC: bytes = b'NHT1'
+# Part of the cache key of tables built for text fields, bumped whenever
+# build or the layout gives a different table for the same field
+TABLE_VERSION: int = 1
+NO_HOP: int = 255
+UNREACHABLE: int = 0xFFFF
+
+# The build is a BFS from every cell in Python, about 2 s at 1000 cells and
+# growing quadratically. Bigger fields only get a table compiled offline.
+LIVE_TABLE_CELLS: int = 1000
+OFFLINE_TABLE_CELLS: int = 3000
+
+
+class NextHopTable:
+    # All-pairs shortest paths over the walkable cells of a play field.
+    # Cell pairs are stored target-major: entry [to * n + from] holds the
+    # distance between the cells and the index of the adjacent() step
+    # that leads from `from` one tile closer to `to`.
+    def __init__(self, width: int, height: int, cells_count: int, index: array,
+                 distances: array, hops: array):
+
+        self.width: int = width
+        self.height: int = height
+        self.cells_count: int = cells_count
+        self.index: array = index
+        self.distances: array = distances
+        self.hops: array = hops
+
+        self.steps: Tuple[Tuple[int, int]] = tuple((d[0], -d[1]) for d in f.adjacent())
+
+    @classmethod
+    def build(cls, play_field: List[List[int]]) -> 'NextHopTable':
+
+        height = len(play_field)
+        width = len(play_field[0])
+
+        index = array('i', [-1]) * (width * height)
+        cells: List[Tuple[int, int]] = []
+
+        for y, row in enumerate(play_field):
+            for x, elem in enumerate(row):
+
+                if elem != 1:
+                    index[y * width + x] = len(cells)
+                    cells.append((x, y))
+
+        n = len(cells)
+        distances = array('H', [UNREACHABLE]) * (n * n)
+        hops = array('B', [NO_HOP]) * (n * n)
+
+        steps = tuple((d[0], -d[1]) for d in f.adjacent())
+
+        # Reverse steps: reaching `cell` from `current` via steps[k] means the
+        # hop from `cell` back towards the BFS root is the opposite step
+        back = tuple(steps.index((-dx, -dy)) for dx, dy in steps)
+
+        for target, (tx, ty) in enumerate(cells):
+
+            base = target * n
+            distances[base + target] = 0
+
+            queue = deque(((tx, ty),))
+
+            while queue:
+
+                x, y = queue.popleft()
+                dist = distances[base + index[y * width + x]] + 1
+
+                for k, (dx, dy) in enumerate(steps):
+
+                    nx, ny = x + dx, y + dy
+
+                    if nx < 0 or nx >= width or ny < 0 or ny >= height:
+                        continue
+
+                    cell = index[ny * width + nx]
+
+                    if cell == -1 or distances[base + cell] != UNREACHABLE:
+                        continue
+
+                    distances[base + cell] = dist
+                    hops[base + cell] = back[k]
+                    queue.append((nx, ny))
+
+        return cls(width, height, n, index, distances, hops)
+
+    @classmethod
+    def from_buffer(cls, buffer: memoryview) -> 'NextHopTable':
+
+        # Casts views over the buffer, a memory-mapped file is not copied
+        buffer = memoryview(buffer).cast('B')
+        magic, width, height, n = struct.unpack_from('<4sIII', buffer)
+
+        if magic != TABLE_MAGIC:
+            raise ValueError('Not a next-hop table. (func=NextHopTable.from_buffer)')
+
+        index_end = 16 + width * height * 4
+        distances_end = index_end + n * n * 2
+
+        if len(buffer) < distances_end + n * n:
+            raise EOFError('Next-hop table is cut. (func=NextHopTable.from_buffer)')
+
+        return cls(width, height, n, buffer[16:index_end].cast('i'),
+                   buffer[index_end:distances_end].cast('H'),
+                   buffer[distances_end:distances_end + n * n])
+
+    def to_bytes(self) -> bytes:
+
+        return struct.pack('<4sIII', TABLE_MAGIC, self.width, self.height, self.cells_count) + \
+            bytes(self.index) + bytes(self.distances) + bytes(self.hops)
+
+    @classmethod
+    def load(cls, path: str) -> 'NextHopTable':
+
+        with open(path, 'rb') as file:
+            return cls.from_buffer(file.read())
+
+    def save(self, path: str) -> None:
+
+        with open(path, 'wb') as file:
+            file.write(self.to_bytes())
+
+    @classmethod
+    def for_field(cls, field_path: str, play_field: List[List[int]], wall_keys: Sequence[str] = (),
+                  cache_folder: str = 'cache', max_cells: int = LIVE_TABLE_CELLS) -> Optional['NextHopTable']:
+
+        # Built while the field loads, so only small fields get a table here,
+        # big ones keep searching or bring one in a compiled field
+        cells = sum(row.count(0) + row.count(2) for row in play_field)
+
+        if cells > max_cells:
+            return None
+
+        # The walls of a text field depend on wall_keys as much as on the file
+        digest = sha1(f'{TABLE_VERSION} {" ".join(wall_keys)}'.encode())
+
+        with open(field_path, 'rb') as file:
+            digest.update(sha1(file.read()).digest())
+
+        cache_path = os.path.join(cache_folder, f'{digest.hexdigest()}.nht')
+
+        try:
+
+            table = cls.load(cache_path)
+
+            # A table of another grid would hand out hops into walls
+            if (table.width, table.height, table.cells_count) == (len(play_field[0]), len(play_field), cells):
+                return table
+
+        except (OSError, ValueError, EOFError):
+            pass
+
+        table = cls.build(play_field)
+
+        # Written aside and renamed, a game loading the same field never reads half a table
+        tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+
+        try:
+
+            os.makedirs(cache_folder, exist_ok=True)
+            table.save(tmp_path)
+            os.replace(tmp_path, cache_path)
+
+        except OSError:
+            print(f'Can not write cache. (func=NextHopTable.for_field, {cache_path=})')
+
+        return table
+
+    def _cell(self, pos: Tuple[int, int]) -> int:
+
+        if pos[0] < 0 or pos[0] >= self.width or pos[1] < 0 or pos[1] >= self.height:
+            return -1
+
+        return self.index[pos[1] * self.width + pos[0]]
+
+    def distance(self, begin: Tuple[int, int], end: Tuple[int, int]) -> int:
+
+        cell_from, cell_to = self._cell(begin), self._cell(end)
+
+        if cell_from == -1 or cell_to == -1:
+            return -1
+
+        dist = self.distances[cell_to * self.cells_count + cell_from]
+
+        return -1 if dist == UNREACHABLE else dist
+
+    def next_step(self, begin: Tuple[int, int], end: Tuple[int, int]) -> Optional[Tuple[int, int]]:
+
+        cell_from, cell_to = self._cell(begin), self._cell(end)
+
+        if cell_from == -1 or cell_to == -1 or cell_from == cell_to:
+            return None
+
+        hop = self.hops[cell_to * self.cells_count + cell_from]
+
+        if hop == NO_HOP:
+            return None
+
+        return f.vec_sum(begin, self.steps[hop])
+
+    def find_path(self, begin: Tuple[int, int], end: Tuple[int, int]) -> Tuple[List[Tuple[int, int]], int]:
+
+        begin, end = tuple(begin), tuple(end)
+        cost = self.distance(begin, end)
+
+        if cost == -1:
+            return [], 0
+
+        path = [begin]
+        base = self._cell(end) * self.cells_count
+
+        while path[-1] != end:
+
+            pos = path[-1]
+            hop = self.hops[base + self.index[pos[1] * self.width + pos[0]]]
+
+            path.append(f.vec_sum(pos, self.steps[hop]))
+
+        return path, cost
+
+
+class FlowField:
+    # Distance map from every walkable cell to one target tile, any number
+    # of ghosts walk towards the target by stepping to a smaller distance
+    def __init__(self, play_rows: List[List[int]], target: Tuple[int, int]):
+
+        self.target: Tuple[int, int] = tuple(target)
+        self.height: int = len(play_rows)
+        self.width: int = len(play_rows[0])
+        self.distances: array = array('i', [-1]) * (self.width * self.height)
+
+        self.steps: Tuple[Tuple[int, int]] = tuple((d[0], -d[1]) for d in f.adjacent())
+
+        tx, ty = self.target
+
+        if tx < 0 or tx >= self.width or ty < 0 or ty >= self.height or play_rows[ty][tx] == 1:
+            return
+
+        self.distances[ty * self.width + tx] = 0
+        queue = deque((self.target,))
+
+        while queue:
+
+            x, y = queue.popleft()
+            dist = self.distances[y * self.width + x] + 1
+
+            for dx, dy in self.steps:
+
+                nx, ny = x + dx, y + dy
+
+                if nx < 0 or nx >= self.width or ny < 0 or ny >= self.height:
+                    continue
+
+                if play_rows[ny][nx] == 1 or self.distances[ny * self.width + nx] != -1:
+                    continue
+
+                self.distances[ny * self.width + nx] = dist
+                queue.append((nx, ny))
+
+    def distance(self, pos: Tuple[int, int]) -> int:
+
+        if pos[0] < 0 or pos[0] >= self.width or pos[1] < 0 or pos[1] >= self.height:
+            return -1
+
+        return self.distances[pos[1] * self.width + pos[0]]
+
+    def next_step(self, pos: Tuple[int, int]) -> Optional[Tuple[int, int]]:
+
+        dist = self.distance(pos)
+
+        if dist <= 0:
+            return None
+
+        for dx, dy in self.steps:
+
+            new_pos = (pos[0] + dx, pos[1] + dy)
+
+            if self.distance(new_pos) == dist - 1:
+                return new_pos
+
+        return None
+
+    def find_path(self, begin: Tuple[int, int]) -> Tuple[List[Tuple[int, int]], int]:
+
+        begin = tuple(begin)
+        cost = self.distance(begin)
+
+        if cost == -1:
+            return [], 0
+
+        path = [begin]
+
+        while len(path) <= cost:
+            path.append(self.next_step(path[-1]))
+
+        return path, cost
+
+
+class FlowFieldCache:
+    # Keeps the distance maps of the last few targets, the ghosts of a swarm
+    # share one map per target instead of searching on their own
+    def __init__(self, play_rows: List[List[int]], size: int = 4):
+
+        self.play_rows: List[List[int]] = play_rows
+        self.size: int = size
+        self.flows: OrderedDict = OrderedDict()
+
+    def get(self, target: Tuple[int, int]) -> FlowField:
+
+        target = tuple(target)
+
+        if target in self.flows:
+
+            self.flows.move_to_end(target)
+
+        else:
+
+            self.flows[target] = FlowField(self.play_rows, target)
+
+            if len(self.flows) > self.size:
+                self.flows.popitem(last=False)
+
+        return self.flows[target]
+
+    def find_path(self, begin: Tuple[int, int], end: Tuple[int, int]) -> Tuple[List[Tuple[int, int]], int]:
+
+        return self.get(end).find_path(begin)
@@ -0,0 +1,134 @@
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+import numpy as np
+
+
+PELLET_EATEN: str = 'pellet eaten'
+PELLET_RESPAWNED: str = 'pellet respawned'
+LEVEL_CLEARED: str = 'level cleared'
+
+
+class PelletEvent(NamedTuple):
+    kind: str
+    pos: Tuple[int, int]
+    key: str
+
+
+Listener = Callable[[PelletEvent], None]
+
+
+class PelletIndex:
+    # Consumables of a field: a static layout of which pellet sits where and a
+    # live bitset of the ones still there, so nothing has to scan the tile grid
+    def __init__(self, shape: Tuple[int, int], pellets: Dict[Tuple[int, int], str]):
+
+        self.keys: Tuple[str] = tuple(sorted(set(pellets.values())))
+        self.positions: List[Tuple[int, int]] = list(pellets)
+
+        # 0 means no pellet, otherwise the index into keys plus one
+        self.layout: np.ndarray = np.zeros(shape, dtype=np.uint8)
+
+        for (x, y), key in pellets.items():
+            self.layout[y, x] = self.keys.index(key) + 1
+
+        self.present: np.ndarray = self.layout != 0
+        self.remaining: Dict[str, int] = {}
+        self.left: int = 0
+
+        self.listeners: List[Listener] = []
+
+        self.__recount()
+
+    def __recount(self) -> None:
+
+        counts = np.bincount(self.layout[self.present], minlength=len(self.keys) + 1)
+
+        self.remaining = {key: int(counts[i + 1]) for i, key in enumerate(self.keys)}
+        self.left = int(counts[1:].sum())
+
+    def subscribe(self, listener: Listener) -> None:
+
+        self.listeners.append(listener)
+
+    def __notify(self, kind: str, pos: Optional[Tuple[int, int]], key: Optional[str]) -> None:
+
+        event = PelletEvent(kind, pos, key)
+
+        for listener in self.listeners:
+            listener(event)
+
+    def key(self, pos: Tuple[int, int]) -> Optional[str]:
+
+        # Pellet still lying on pos, None for eaten pellets and other tiles
+        if not self.present[pos[1], pos[0]]:
+            return None
+
+        return self.keys[self.layout[pos[1], pos[0]] - 1]
+
+    def eat(self, pos: Tuple[int, int]) -> Optional[str]:
+
+        key = self.key(pos)
+
+        if key is None:
+            return None
+
+        self.present[pos[1], pos[0]] = False
+        self.remaining[key] -= 1
+        self.left -= 1
+
+        self.__notify(PELLET_EATEN, tuple(pos), key)
+
+        if self.left == 0:
+            self.__notify(LEVEL_CLEARED, None, None)
+
+        return key
+
+    def __flip(self, cells: np.ndarray) -> None:
+
+        # Every cell that flips gets its own event so renderers repaint only those
+        # tiles, counts follow the flipped cells instead of a recount of the grid
+        present = self.present.reshape(-1)
+        present[cells] = ~present[cells]
+
+        for cell in cells.tolist():
+
+            y, x = divmod(cell, self.present.shape[1])
+            key = self.keys[self.layout[y, x] - 1]
+            step = 1 if present[cell] else -1
+
+            self.remaining[key] += step
+            self.left += step
+
+            self.__notify(PELLET_RESPAWNED if step == 1 else PELLET_EATEN, (x, y), key)
+
+    def respawn(self) -> None:
+
+        self.__flip(np.flatnonzero((self.layout != 0) != self.present))
+
+    def remaining_positions(self, keys: Iterable[str] = None) -> List[Tuple[int, int]]:
+
+        mask = self.present
+
+        if keys is not None:
+            mask = mask & np.isin(self.layout, [self.keys.index(key) + 1 for key in keys if key in self.keys])
+
+        return [(x, y) for y, x in np.argwhere(mask).tolist()]
+
+    def snapshot(self) -> bytes:
+
+        # One bit per cell, small enough to keep per tick
+        return np.packbits(self.present).tobytes()
+
+    def restore(self, snapshot: bytes) -> None:
+
+        packed = np.frombuffer(snapshot, dtype=np.uint8)
+
+        # Compared a byte at a time, only bytes that differ are unpacked,
+        # restoring a nearby snapshot stays cheap on the largest fields
+        differ = np.flatnonzero(np.packbits(self.present) != packed)
+        cells = (differ[:, None] * 8 + np.arange(8)).reshape(-1)
+        bits = np.unpackbits(packed[differ]).astype(bool)
+
+        inside = cells < self.present.size
+        cells, bits = cells[inside], bits[inside] & (self.layout.reshape(-1)[cells[inside]] != 0)
+
+        self.__flip(cells[bits != self.present.reshape(-1)[cells]])
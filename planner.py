@@ -0,0 +1,194 @@
+from typing import Dict, List, Optional, Set, Tuple
+from collections import OrderedDict
+from heapq import heapify, heappop, heappush
+import funcs as f
+
+
+class SearchTree:
+    # A* search state rooted at one start tile that survives between queries.
+    # Closed tiles have exact distances from the root whatever goal closed
+    # them, so a new goal only re-keys the open list and searches on.
+    def __init__(self, play_rows: List[List[int]], root: Tuple[int, int]):
+
+        self.play_rows: List[List[int]] = play_rows
+        self.height: int = len(play_rows)
+        self.width: int = len(play_rows[0])
+        self.steps: Tuple[Tuple[int, int]] = tuple((d[0], -d[1]) for d in f.adjacent())
+
+        self.root: Tuple[int, int] = root
+        self.goal: Optional[Tuple[int, int]] = None
+
+        self.g: Dict[Tuple[int, int], int] = {root: 0}
+        self.parent: Dict[Tuple[int, int], Tuple[int, int]] = {root: None}
+        self.closed: Set[Tuple[int, int]] = set()
+        # Closed tiles in expansion order, a parent always comes before its children
+        self.order: List[Tuple[int, int]] = []
+
+        self.frontier: Set[Tuple[int, int]] = {root}
+        self.heap: List[Tuple[int, int, Tuple[int, int]]] = [(0, 0, root)]
+
+    def retarget(self, goal: Tuple[int, int]) -> None:
+
+        if goal == self.goal:
+            return
+
+        self.goal = goal
+
+        # Only the open list depends on the goal, the rest of the tree stays
+        self.heap = [(self.g[pos] + f.grid_dist(pos, goal), f.grid_dist(pos, goal), pos) for pos in self.frontier]
+        heapify(self.heap)
+
+    def search(self) -> bool:
+
+        goal = self.goal
+
+        while goal not in self.closed:
+
+            if not self.heap:
+                return False
+
+            current = heappop(self.heap)[2]
+
+            if current in self.closed:
+                continue
+
+            self.closed.add(current)
+            self.frontier.discard(current)
+            self.order.append(current)
+
+            f.astar_stats['expanded'] += 1
+
+            new_g = self.g[current] + 1
+
+            for dx, dy in self.steps:
+
+                node_pos = (current[0] + dx, current[1] + dy)
+
+                if node_pos[0] < 0 or node_pos[0] >= self.width or \
+                        node_pos[1] < 0 or node_pos[1] >= self.height:
+                    continue
+
+                if self.play_rows[node_pos[1]][node_pos[0]] == 1 or node_pos in self.closed:
+                    continue
+
+                if new_g < self.g.get(node_pos, new_g + 1):
+
+                    self.g[node_pos] = new_g
+                    self.parent[node_pos] = current
+                    self.frontier.add(node_pos)
+
+                    h = f.grid_dist(node_pos, goal)
+                    heappush(self.heap, (new_g + h, h, node_pos))
+
+        return True
+
+    def reroot(self, root: Tuple[int, int]) -> None:
+
+        # The subtree under a closed tile is a shortest path tree of that tile
+        # with every distance lowered by its depth, everything else is dropped
+        base = self.g[root]
+        kept: Set[Tuple[int, int]] = {root}
+
+        for pos in self.order:
+            if self.parent[pos] in kept:
+                kept.add(pos)
+
+        self.order = [pos for pos in self.order if pos in kept]
+        self.closed = kept
+        self.g = {pos: self.g[pos] - base for pos in self.order}
+        self.parent = {pos: self.parent[pos] for pos in self.order}
+        self.parent[root] = None
+        self.root = root
+
+        # The new open list is every tile next to the kept part of the tree
+        self.frontier = set()
+
+        for pos in self.order:
+
+            new_g = self.g[pos] + 1
+
+            for dx, dy in self.steps:
+
+                node_pos = (pos[0] + dx, pos[1] + dy)
+
+                if node_pos[0] < 0 or node_pos[0] >= self.width or \
+                        node_pos[1] < 0 or node_pos[1] >= self.height:
+                    continue
+
+                if self.play_rows[node_pos[1]][node_pos[0]] == 1 or node_pos in kept:
+                    continue
+
+                if new_g < self.g.get(node_pos, new_g + 1):
+                    self.g[node_pos] = new_g
+                    self.parent[node_pos] = pos
+                    self.frontier.add(node_pos)
+
+        goal, self.goal = self.goal, None
+
+        if goal is not None:
+            self.retarget(goal)
+
+    def path(self) -> Tuple[List[Tuple[int, int]], int]:
+
+        path = []
+        node = self.goal
+
+        while node is not None:
+            path.append(node)
+            node = self.parent[node]
+
+        return path[::-1], self.g[self.goal]
+
+
+class IncrementalPlanner:
+    # Per ghost planner keeping its last few search trees. A tree is reused
+    # as long as the new start tile is inside it, so a ghost stepping along
+    # its path or comparing its current and next tile rarely searches anew.
+    def __init__(self, play_rows: List[List[int]], trees: int = 2):
+
+        self.play_rows: List[List[int]] = play_rows
+        self.size: int = trees
+        self.trees: OrderedDict = OrderedDict()
+
+    def __tree(self, begin: Tuple[int, int]) -> SearchTree:
+
+        if begin in self.trees:
+
+            self.trees.move_to_end(begin)
+
+            return self.trees[begin]
+
+        # The least recently used tree holding the new start is moved onto it
+        for root, tree in self.trees.items():
+
+            if begin in tree.closed:
+
+                del self.trees[root]
+                tree.reroot(begin)
+                self.trees[begin] = tree
+
+                return tree
+
+        f.astar_stats['calls'] += 1
+
+        self.trees[begin] = SearchTree(self.play_rows, begin)
+
+        if len(self.trees) > self.size:
+            self.trees.popitem(last=False)
+
+        return self.trees[begin]
+
+    def find_path(self, begin: Tuple[int, int], end: Tuple[int, int]) -> Tuple[List[Tuple[int, int]], int]:
+
+        begin, end = tuple(begin), tuple(end)
+
+        if self.play_rows[begin[1]][begin[0]] == 1:
+            return [], 0
+
+        tree = self.__tree(begin)
+        tree.retarget(end)
+
+        if not tree.search():
+            return [], 0
+
+        return tree.path()
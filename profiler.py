@@ -0,0 +1,190 @@
+from typing import Dict, List, Optional, Tuple
+from collections import deque
+from threading import Lock
+from time import perf_counter
+import json
+import pygame as pg
+import funcs as f
+
+
+class Phase:
+    # Context manager adding its run time to one phase of the current frame
+    def __init__(self, profiler: 'FrameProfiler', name: str):
+
+        self.profiler: FrameProfiler = profiler
+        self.name: str = name
+        self.start: float = 0.0
+
+    def __enter__(self) -> 'Phase':
+
+        self.start = perf_counter()
+
+        return self
+
+    def __exit__(self, *args) -> None:
+
+        self.profiler.add(self.name, perf_counter() - self.start)
+
+
+class ProfiledPlanner:
+    # Wraps a ghost planner to time and count every path request
+    def __init__(self, planner, profiler: 'FrameProfiler'):
+
+        self.planner = planner
+        self.profiler: FrameProfiler = profiler
+
+    def find_path(self, begin: Tuple[int, int], end: Tuple[int, int]) -> Tuple[List[Tuple[int, int]], int]:
+
+        # Searches may run on scheduler threads, so the time is kept locally
+        # instead of in the shared Phase object
+        start = perf_counter()
+
+        try:
+            return self.planner.find_path(begin, end)
+
+        finally:
+            self.profiler.count('path requests')
+            self.profiler.add('pathfinding', perf_counter() - start)
+
+
+class FrameProfiler:
+    def __init__(self, window: int = 300, stream_path: Optional[str] = None):
+
+        self.window: int = window
+        self.frames: int = 0
+        self.frame_start: float = perf_counter()
+
+        self.current: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+        # Milliseconds per phase over the whole run, kept even without frames
+        self.totals: Dict[str, float] = {}
+        self.history: Dict[str, deque] = {}
+        self.phases: Dict[str, Phase] = {}
+
+        # add and count are also called from path search threads
+        self.lock: Lock = Lock()
+
+        self.astar_seen: Dict[str, int] = dict(f.astar_stats)
+
+        self.show_overlay: bool = False
+        self.overlay_lines: List[str] = []
+        self.font: pg.font.Font = None
+
+        # JSON lines or, for a .csv path, one frame_index,name,value row per measurement
+        self.stream = open(stream_path, 'w') if stream_path else None
+        self.csv: bool = bool(stream_path) and stream_path.endswith('.csv')
+
+        if self.csv:
+            self.stream.write('frame_index,name,value\n')
+
+    def phase(self, name: str) -> Phase:
+
+        if name not in self.phases:
+            self.phases[name] = Phase(self, name)
+
+        return self.phases[name]
+
+    def add(self, name: str, seconds: float) -> None:
+
+        with self.lock:
+            self.current[name] = self.current.get(name, 0.0) + seconds * 1000
+            self.totals[name] = self.totals.get(name, 0.0) + seconds * 1000
+
+    def count(self, name: str, n: int = 1) -> None:
+
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def begin_frame(self) -> None:
+
+        self.frame_start = perf_counter()
+
+    def end_frame(self) -> None:
+
+        self.add('frame', perf_counter() - self.frame_start)
+
+        with self.lock:
+
+            for key, total in f.astar_stats.items():
+                self.counters[f'Astar {key}'] = total - self.astar_seen[key]
+                self.astar_seen[key] = total
+
+            sample = {**self.current, **self.counters}
+            self.current = {}
+            self.counters = {}
+
+        for name in self.history.keys() | sample.keys():
+
+            if name not in self.history:
+                self.history[name] = deque(maxlen=self.window)
+
+            self.history[name].append(sample.get(name, 0))
+
+        if self.stream is not None:
+            self.__write(sample)
+
+        self.frames += 1
+
+        if self.show_overlay and self.frames % 15 == 0:
+            self.overlay_lines = self.report_lines()
+
+    def __write(self, sample: Dict[str, float]) -> None:
+
+        if self.csv:
+            self.stream.writelines(f'{self.frames},{name},{round(value, 4)}\n' for name, value in sample.items())
+        else:
+            self.stream.write(json.dumps({'frame_index': self.frames, **sample}) + '\n')
+
+    def percentiles(self, name: str) -> Dict[str, float]:
+
+        values = sorted(self.history.get(name, ()))
+
+        if not values:
+            return {'p50': 0.0, 'p95': 0.0, 'p99': 0.0}
+
+        return {f'p{p}': values[min(len(values) - 1, len(values) * p // 100)] for p in (50, 95, 99)}
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+
+        return {name: self.percentiles(name) for name in sorted(self.history)}
+
+    def report_lines(self) -> List[str]:
+
+        return [f'{name:<24} p50 {s["p50"]:7.2f}  p95 {s["p95"]:7.2f}  p99 {s["p99"]:7.2f}'
+                for name, s in self.stats().items()]
+
+    def toggle_overlay(self) -> None:
+
+        self.show_overlay = not self.show_overlay
+        self.overlay_lines = self.report_lines()
+
+    def draw_overlay(self, screen: pg.Surface) -> Optional[pg.Rect]:
+
+        if not self.show_overlay:
+            return None
+
+        if self.font is None:
+            pg.font.init()
+            self.font = pg.font.SysFont('monospace', 12)
+
+        lines = [self.font.render(line, True, (255, 255, 255), (0, 0, 0)) for line in self.overlay_lines]
+        rect = pg.Rect(0, 0, max((line.get_width() for line in lines), default=0),
+                       sum(line.get_height() for line in lines))
+
+        y = 0
+        for line in lines:
+            screen.blit(line, (0, y))
+            y += line.get_height()
+
+        return rect
+
+    def save(self, path: str) -> None:
+
+        with open(path, 'w') as file:
+            json.dump({'frames': self.frames, 'stats': self.stats()}, file, indent=2)
+
+    def close(self) -> None:
+
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
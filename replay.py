@@ -0,0 +1,213 @@
+from typing import Dict, List, Optional, Tuple
+from argparse import ArgumentParser
+from array import array
+from time import perf_counter
+import json
+import struct
+from main import Game
+from headless import HeadlessGame
+
+
+REPLAY_MAGIC: bytes = b'PRPL'
+REPLAY_VERSION: int = 1
+
+# magic, version, settings length, inputs count
+HEADER = struct.Struct('<4sHII')
+
+# One byte per input, the index of its direction
+DIRECTIONS: Tuple[Tuple[int, int]] = ((0, -1), (1, 0), (0, 1), (-1, 0))
+
+Direction = Tuple[int, int]
+
+
+class Recording:
+    # Everything a session depends on: the game settings, the seed and the
+    # change_dir inputs with the tick each one was taken on
+    def __init__(self, settings: Dict[str, object], inputs: List[Tuple[int, Direction]],
+                 result: Optional[Dict[str, int]] = None):
+
+        self.settings: Dict[str, object] = settings
+        self.inputs: List[Tuple[int, Direction]] = inputs
+        self.result: Optional[Dict[str, int]] = result
+
+    @classmethod
+    def from_game(cls, game: Game) -> 'Recording':
+
+        settings = {
+            'field_path': game.field_path, 'size': list(game.size), 'tick_rate': game.tick_rate,
+            'swarm': game.swarm.count if game.swarm is not None else 0, 'seed': game.seed,
+            'ghosts': list(game.ghosts), 'paths_per_tick': game.scheduler.max_paths
+        }
+        result = {'ticks': game.ticks, 'score': game.pacman.score, 'caught': game.pacman.is_caught}
+
+        return cls(settings, list(game.inputs), result)
+
+    @property
+    def ticks(self) -> int:
+
+        if self.result is not None:
+            return self.result['ticks']
+
+        return self.inputs[-1][0] + 1 if self.inputs else 0
+
+    def to_bytes(self) -> bytes:
+
+        meta = json.dumps({'settings': self.settings, 'result': self.result}).encode()
+
+        ticks = array('I', (tick for tick, _ in self.inputs))
+        codes = bytes(DIRECTIONS.index(tuple(direction)) for _, direction in self.inputs)
+
+        return HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, len(meta), len(self.inputs)) + \
+            meta + ticks.tobytes() + codes
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'Recording':
+
+        magic, version, meta_size, count = HEADER.unpack_from(data)
+
+        if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+            raise ValueError(f'Not a replay of version {REPLAY_VERSION}. (func=Recording.from_bytes)')
+
+        position = HEADER.size
+        meta = json.loads(data[position:position + meta_size])
+        position += meta_size
+
+        ticks = array('I')
+        ticks.frombytes(data[position:position + count * ticks.itemsize])
+        position += count * ticks.itemsize
+
+        codes = data[position:position + count]
+
+        return cls(meta['settings'], [(tick, DIRECTIONS[code]) for tick, code in zip(ticks, codes)],
+                   meta['result'])
+
+    def save(self, path: str) -> None:
+
+        with open(path, 'wb') as file:
+            file.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path: str) -> 'Recording':
+
+        with open(path, 'rb') as file:
+            return cls.from_bytes(file.read())
+
+
+class Replay:
+    # Re-simulates a recording headless, seeking backwards starts over from tick 0
+    def __init__(self, recording: Recording):
+
+        self.recording: Recording = recording
+        self.headless: HeadlessGame = None
+        self.cursor: int = 0
+
+        self.reset()
+
+    @property
+    def game(self) -> Game:
+
+        return self.headless.game
+
+    @property
+    def tick(self) -> int:
+
+        return self.game.ticks
+
+    def reset(self) -> None:
+
+        settings = self.recording.settings
+
+        self.headless = HeadlessGame(field_path=settings['field_path'], size=tuple(settings['size']),
+                                     tick_rate=settings['tick_rate'], swarm=settings['swarm'],
+                                     seed=settings['seed'], ghosts=settings['ghosts'],
+                                     paths_per_tick=settings.get('paths_per_tick'))
+        self.cursor = 0
+
+    def step(self) -> bool:
+
+        inputs = self.recording.inputs
+
+        while self.cursor < len(inputs) and inputs[self.cursor][0] == self.tick:
+            self.game.steer(inputs[self.cursor][1])
+            self.cursor += 1
+
+        return self.headless.step()
+
+    def seek(self, tick: int) -> int:
+
+        if tick < self.tick:
+            self.reset()
+
+        while self.tick < tick and self.step():
+            pass
+
+        return self.tick
+
+    def run(self) -> Dict[str, int]:
+
+        self.seek(self.recording.ticks)
+
+        return {'ticks': self.tick, 'score': self.game.pacman.score, 'caught': self.headless.is_over}
+
+    def matches(self) -> bool:
+
+        # Replaying the whole session must end exactly where the recording did
+        return self.recording.result is None or self.run() == self.recording.result
+
+
+def record(path: str, **settings) -> Recording:
+
+    game = Game(**settings)
+
+    try:
+        game.loop()
+
+    finally:
+        recording = Recording.from_game(game)
+        recording.save(path)
+
+        print(f'Session of {game.ticks} ticks is recorded to {path}.')
+
+    return recording
+
+
+if __name__ == '__main__':
+
+    parser = ArgumentParser(description='Record a session or replay one headless at full speed.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = commands.add_parser('record')
+    record_parser.add_argument('path')
+    record_parser.add_argument('--field', default='field/field.txt')
+    record_parser.add_argument('--seed', type=int, default=0)
+    record_parser.add_argument('--swarm', type=int, default=0)
+
+    play_parser = commands.add_parser('play')
+    play_parser.add_argument('path')
+    play_parser.add_argument('--seek', type=int, default=None, help='stop at this tick')
+
+    args = parser.parse_args()
+
+    if args.command == 'record':
+
+        record(args.path, field_path=args.field, seed=args.seed, swarm=args.swarm)
+
+    else:
+
+        replay = Replay(Recording.load(args.path))
+
+        start = perf_counter()
+
+        if args.seek is not None:
+            replay.seek(args.seek)
+            result = {'ticks': replay.tick, 'score': replay.game.pacman.score, 'caught': replay.headless.is_over}
+        else:
+            result = replay.run()
+
+        elapsed = perf_counter() - start
+
+        print(f'Replay: {result}, {round(result["ticks"] / max(elapsed, 1e-9))} ticks/s.')
+
+        if args.seek is None and replay.recording.result is not None:
+            print('Matches the recording.' if result == replay.recording.result else
+                  f'Differs from the recording {replay.recording.result}.')
@@ -0,0 +1,137 @@
+from typing import Callable, Dict, Optional, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from time import perf_counter
+
+
+class PathScheduler:
+    # Spreads ghost replanning over ticks. A request is served at once while
+    # the tick still has budget, otherwise it waits and the ghost keeps
+    # following its old path. Waiting requests go first on the next tick,
+    # nearest ghosts first and those waiting max_wait ticks before anyone.
+    #
+    # max_paths limits searches per tick and keeps runs reproducible,
+    # budget_ms limits search time per tick and depends on the machine.
+    def __init__(self, max_paths: Optional[int] = None, budget_ms: Optional[float] = None,
+                 priority: Callable[[object], float] = None, max_wait: int = 30, workers: int = 0):
+
+        self.max_paths: Optional[int] = max_paths
+        self.budget_ms: Optional[float] = budget_ms
+        self.priority: Callable[[object], float] = priority or (lambda ghost: 0)
+        self.max_wait: int = max_wait
+
+        self.tick: int = 0
+        self.served: int = 0
+        self.spent_ms: float = 0.0
+
+        # Ghost to the tick it asked on, insertion ordered
+        self.pending: Dict[object, int] = {}
+
+        # With workers searches run on threads and land through futures on a later tick
+        self.executor: Optional[ThreadPoolExecutor] = ThreadPoolExecutor(workers) if workers > 0 else None
+        self.in_flight: Dict[object, Tuple[tuple, Future]] = {}
+
+        self.stats: Dict[str, int] = {'requests': 0, 'deferred': 0, 'stale': 0}
+
+    def __has_budget(self) -> bool:
+
+        return (self.max_paths is None or self.served < self.max_paths) and \
+            (self.budget_ms is None or self.spent_ms < self.budget_ms)
+
+    def begin_tick(self) -> None:
+
+        self.tick += 1
+        self.served = 0
+        self.spent_ms = 0.0
+
+        for ghost in [ghost for ghost, (_, future) in self.in_flight.items() if future.done()]:
+            self.__land(ghost)
+
+        waiting = sorted(self.pending, key=lambda ghost: (self.tick - self.pending[ghost] < self.max_wait,
+                                                          self.priority(ghost)))
+
+        for ghost in waiting:
+
+            if not self.__has_budget():
+                break
+
+            # A ghost has at most one search in flight, its planner is not thread safe
+            if ghost in self.in_flight:
+                continue
+
+            del self.pending[ghost]
+            self.__serve(ghost)
+
+    def request(self, ghost) -> None:
+
+        self.stats['requests'] += 1
+
+        if ghost in self.pending or ghost in self.in_flight:
+
+            # The newest target wins, the ghost keeps its place in the queue
+            self.pending.setdefault(ghost, self.tick)
+
+        elif self.__has_budget():
+
+            self.__serve(ghost)
+
+        else:
+
+            self.stats['deferred'] += 1
+            self.pending[ghost] = self.tick
+
+        ghost.waiting = ghost in self.pending or ghost in self.in_flight
+
+    def __serve(self, ghost) -> None:
+
+        start = perf_counter()
+
+        if self.executor is not None:
+
+            request = ghost.path_request()
+            self.in_flight[ghost] = (request, self.executor.submit(ghost.search_path, request))
+
+        else:
+
+            ghost.replan()
+
+        self.served += 1
+        self.spent_ms += (perf_counter() - start) * 1000
+
+        ghost.waiting = ghost in self.pending or ghost in self.in_flight
+
+    def __land(self, ghost) -> None:
+
+        request, future = self.in_flight.pop(ghost)
+
+        # The ghost moved on or got a new target while the search ran
+        if ghost.path_request()[::2] != request[::2]:
+            self.stats['stale'] += 1
+            self.pending.setdefault(ghost, self.tick)
+
+        else:
+            ghost.apply_path(*future.result())
+
+        ghost.waiting = ghost in self.pending or ghost in self.in_flight
+
+    def snapshot(self) -> Tuple[int, Tuple[Tuple[object, int]]]:
+
+        # Searches still running are taken as waiting, a restore asks them again
+        return self.tick, tuple(self.pending.items()) + tuple((ghost, self.tick) for ghost in self.in_flight)
+
+    def restore(self, state: Tuple[int, Tuple[Tuple[object, int]]]) -> None:
+
+        self.tick, pending = state
+        self.pending = dict(pending)
+
+        # Searches started after the snapshot are waited for and dropped,
+        # so a new one never runs next to them on the same planner
+        for _, future in self.in_flight.values():
+            future.result()
+
+        self.in_flight.clear()
+
+    def close(self) -> None:
+
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
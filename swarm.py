@@ -0,0 +1,235 @@
+from typing import Dict, List, Tuple
+from random import Random
+import os
+import numpy as np
+import pygame as pg
+import funcs as f
+from collision import CollisionEvent, GHOST_EATEN, PLAYER_CAUGHT
+
+
+# Ghost states
+NORMAL: int = 0
+FRIGHTENED: int = 1
+DEAD: int = 2
+
+# Target policies, same personalities as the Ghost subclasses
+RED: int = 0
+GREEN: int = 1
+BLUE: int = 2
+YELLOW: int = 3
+
+Policy_colors: Tuple[str] = ('red', 'green', 'blue', 'yellow')
+
+STEPS: np.ndarray = np.array([(d[0], -d[1]) for d in f.adjacent()], dtype=np.int32)
+
+# Arrays that change while the swarm moves, the rest is fixed at creation
+State_arrays: Tuple[str] = ('tile', 'pos', 'last_pos', 'direction', 'velocity', 'state', 'target', 'waypoint')
+
+
+class GhostSwarm:
+    # Struct-of-arrays ghosts: every attribute is a packed array indexed by
+    # ghost and each tick updates all of them with batched NumPy operations
+    def __init__(self, field, spawns: List[Tuple[int, int]], count: int, sprite_folder: str,
+                 v: float, seed: int = 0, waypoints: int = 8):
+
+        self.field = field
+        self.count: int = count
+        self.rng: Random = Random(seed)
+        self.size: Tuple[int, int] = (field.tile_size, field.tile_size)
+
+        origin = np.array(field.get_world_pos(0, 0), dtype=np.float32)
+
+        self.origin: np.ndarray = origin
+        self.policy: np.ndarray = np.arange(count, dtype=np.uint8) % len(Policy_colors)
+        self.spawn: np.ndarray = np.array([spawns[i % len(spawns)] for i in range(count)], dtype=np.int32)
+        self.tile: np.ndarray = self.spawn.copy()
+        self.pos: np.ndarray = origin + self.tile.astype(np.float32) * field.tile_size
+        self.last_pos: np.ndarray = self.pos.copy()
+        self.direction: np.ndarray = np.zeros((count, 2), dtype=np.int32)
+        self.base_v: float = field.speed(v)
+        self.velocity: np.ndarray = np.full(count, self.base_v, dtype=np.float32)
+        self.state: np.ndarray = np.zeros(count, dtype=np.uint8)
+        self.target: np.ndarray = self.spawn.copy()
+
+        # Yellow ghosts wander between a few shared random cells, so their
+        # distance maps stay in the flow field cache
+        free = field.find_walkable()
+        field.flow_fields.size = max(field.flow_fields.size, waypoints + len(spawns) + 3)
+        self.waypoints: np.ndarray = np.array(self.rng.sample(free, min(waypoints, len(free))), dtype=np.int32)
+        self.waypoint: np.ndarray = np.array([self.rng.randrange(len(self.waypoints)) for _ in range(count)],
+                                             dtype=np.int32)
+
+        # Padded NumPy views of the flow fields, rebuilt when the cache replaces a field
+        self.distance_maps: Dict[Tuple[int, int], Tuple[object, np.ndarray]] = {}
+
+        self.frames: Dict[Tuple[int, int], pg.Surface] = {}
+
+        for policy, color in enumerate(Policy_colors):
+            self.frames[(policy, NORMAL)] = f.sprite_cache.get(
+                os.path.join(sprite_folder, f'{color}_ghost.png'), self.size
+            )
+            self.frames[(policy, DEAD)] = self.frames[(policy, NORMAL)]
+            self.frames[(policy, FRIGHTENED)] = f.sprite_cache.get(
+                os.path.join(sprite_folder, 'weak_ghost.png'), self.size
+            )
+
+    def __update_state(self, can_eat_ghosts: bool) -> None:
+
+        alive = self.state != DEAD
+        self.state[alive] = FRIGHTENED if can_eat_ghosts else NORMAL
+
+        # Same speeds as Ghost: half speed when frightened, five times when eaten
+        self.velocity[:] = self.base_v
+        self.velocity[self.state == FRIGHTENED] = self.base_v / 2
+        self.velocity[self.state == DEAD] = self.base_v * 5
+
+    def __cross_tiles(self) -> np.ndarray:
+
+        next_pos = self.origin + (self.tile + self.direction).astype(np.float32) * self.field.tile_size
+
+        crossed = np.any(self.direction != 0, axis=1) & \
+            (np.sum((self.pos - next_pos) * self.direction, axis=1) >= 0)
+
+        self.tile[crossed] += self.direction[crossed]
+        self.pos[crossed] = next_pos[crossed]
+
+        return crossed | np.all(self.direction == 0, axis=1)
+
+    def __update_targets(self, deciding: np.ndarray, pacman) -> None:
+
+        pac_tile = np.array(pacman.field_pos, dtype=np.int32)
+        ahead = f.vec_sum(pacman.field_pos, pacman.direction)
+
+        if self.field.play_field[ahead[1], ahead[0]] != 0:
+            ahead = pacman.prev_pos
+
+        reached = deciding & (self.policy == YELLOW) & np.all(self.tile == self.target, axis=1)
+
+        for i in np.flatnonzero(reached):
+            self.waypoint[i] = self.rng.randrange(len(self.waypoints))
+
+        targets = np.empty_like(self.target)
+        targets[self.policy == RED] = pac_tile
+        targets[self.policy == GREEN] = pacman.prev_pos
+        targets[self.policy == BLUE] = ahead
+        targets[self.policy == YELLOW] = self.waypoints[self.waypoint[self.policy == YELLOW]]
+
+        home = self.state != NORMAL
+        targets[home] = self.spawn[home]
+
+        self.target[deciding] = targets[deciding]
+
+    def __choose_directions(self, deciding: np.ndarray) -> None:
+
+        indices = np.flatnonzero(deciding)
+
+        if len(indices) == 0:
+            return
+
+        # One distance map per distinct target, shared through the flow field cache
+        keys = self.target[indices, 1].astype(np.int64) * self.field.play_field.shape[1] + self.target[indices, 0]
+
+        for key in np.unique(keys):
+
+            group = indices[keys == key]
+            target = tuple(self.target[group[0]].tolist())
+
+            padded = self.__distance_map(target)
+
+            xs, ys = self.tile[group, 0], self.tile[group, 1]
+            current = padded[ys + 1, xs + 1]
+
+            around = np.stack([padded[ys + 1 + dy, xs + 1 + dx] for dx, dy in STEPS], axis=1)
+            around = np.where(around >= 0, around, np.iinfo(np.int32).max)
+
+            best = np.argmin(around, axis=1)
+            moves = (current > 0) & (around[np.arange(len(group)), best] < current)
+
+            self.direction[group] = np.where(moves[:, None], STEPS[best], 0)
+
+            # Eaten ghosts come back to life at their spawn
+            arrived = group[current == 0]
+            self.state[arrived[self.state[arrived] == DEAD]] = NORMAL
+
+    def __distance_map(self, target: Tuple[int, int]) -> np.ndarray:
+
+        flow = self.field.flow_fields.get(target)
+        cached = self.distance_maps.get(target)
+
+        if cached is None or cached[0] is not flow:
+
+            distances = np.frombuffer(flow.distances, dtype=np.int32).reshape(self.field.play_field.shape)
+            cached = (flow, np.pad(distances, 1, constant_values=-1))
+
+            self.distance_maps[target] = cached
+
+        return cached[1]
+
+    def __check_collisions(self, pacman) -> List[CollisionEvent]:
+
+        # The swarm is already packed, one vectorized test covers every ghost
+        overlap = np.all(np.abs(self.pos - np.array(pacman.screen_pos, dtype=np.float32)) < self.size[0], axis=1)
+
+        eaten = np.flatnonzero(overlap & (self.state == FRIGHTENED))
+        caught = np.flatnonzero(overlap & (self.state == NORMAL))
+
+        self.state[eaten] = DEAD
+
+        return [CollisionEvent(GHOST_EATEN, pacman, i) for i in eaten.tolist()] + \
+            [CollisionEvent(PLAYER_CAUGHT, pacman, i) for i in caught.tolist()]
+
+    def move(self, pacman) -> List[CollisionEvent]:
+
+        self.last_pos[:] = self.pos
+
+        self.__update_state(pacman.can_eat_ghosts)
+
+        deciding = self.__cross_tiles()
+
+        self.__update_targets(deciding, pacman)
+        self.__choose_directions(deciding)
+        events = self.__check_collisions(pacman)
+
+        self.pos += self.direction * self.velocity[:, None]
+
+        return events
+
+    def snapshot(self) -> Tuple[Tuple[np.ndarray], tuple]:
+
+        return tuple(getattr(self, name).copy() for name in State_arrays), self.rng.getstate()
+
+    def restore(self, state: Tuple[Tuple[np.ndarray], tuple]) -> None:
+
+        arrays, rng = state
+
+        # Copied in place, the snapshot stays untouched for the next restore
+        for name, array in zip(State_arrays, arrays):
+            getattr(self, name)[:] = array
+
+        self.rng.setstate(rng)
+
+    def render_pos(self, alpha: float) -> np.ndarray:
+
+        return (self.last_pos + (self.pos - self.last_pos) * alpha).astype(np.int32)
+
+    def __visible(self, alpha: float) -> Tuple[np.ndarray, np.ndarray]:
+
+        # Screen positions of the ghosts inside the camera view and their indices
+        camera = self.field.camera
+        pos = self.render_pos(alpha) - np.array(camera.pos, dtype=np.int32)
+
+        inside = np.all((pos > -np.array(self.size)) & (pos < np.array(camera.view_size)), axis=1)
+
+        return np.flatnonzero(inside), pos[inside]
+
+    def rects(self, alpha: float = 1.0) -> List[pg.Rect]:
+
+        return [pg.Rect(x, y, *self.size) for x, y in self.__visible(alpha)[1].tolist()]
+
+    def draw(self, screen: pg.Surface, alpha: float = 1.0) -> None:
+
+        indices, pos = self.__visible(alpha)
+
+        screen.blits([(self.frames[(policy, state)], (x, y)) for policy, state, (x, y) in
+                      zip(self.policy[indices].tolist(), self.state[indices].tolist(), pos.tolist())],
+                     doreturn=False)
@@ -0,0 +1,255 @@
+from typing import Dict, List, Sequence, Tuple
+from argparse import ArgumentParser
+import json
+import os
+import numpy as np
+
+
+TRACE_VERSION: int = 1
+META_NAME: str = 'meta.json'
+
+# Column name to its dtype and the shape of one row
+Columns = Dict[str, Tuple[str, Tuple[int, ...]]]
+
+
+class TraceWriter:
+    # Columnar trace in a folder: one raw fixed-width file per column and a
+    # meta.json describing them. Files grow a block of rows at a time and the
+    # block is a writable memory map, so a row only stores numbers into arrays.
+    def __init__(self, folder: str, columns: Columns, attrs: Dict[str, object] = None, block: int = 4096):
+
+        self.folder: str = folder
+        self.columns: Columns = {name: (np.dtype(dtype).str, tuple(shape)) for name, (dtype, shape) in columns.items()}
+        self.attrs: Dict[str, object] = attrs or {}
+        self.block: int = block
+
+        self.rows: int = 0
+        self.block_start: int = 0
+        self.row_bytes: Dict[str, int] = {name: int(np.dtype(dtype).itemsize * np.prod(shape, dtype=np.int64))
+                                          for name, (dtype, shape) in self.columns.items()}
+
+        os.makedirs(folder, exist_ok=True)
+
+        self.files = {name: open(os.path.join(folder, f'{name}.bin'), 'w+b') for name in self.columns}
+        self.maps: Dict[str, np.memmap] = {}
+        # Plain array views of the maps, item writes skip the memmap subclass hooks
+        self.views: Dict[str, np.ndarray] = {}
+
+        self.__map(0)
+        self.__write_meta()
+
+    def __map(self, start: int) -> None:
+
+        self.flush()
+
+        for name, (dtype, shape) in self.columns.items():
+
+            file = self.files[name]
+            end = (start + self.block) * self.row_bytes[name]
+
+            if os.fstat(file.fileno()).st_size < end:
+                file.truncate(end)
+
+            self.maps[name] = np.memmap(file, dtype=dtype, mode='r+', offset=start * self.row_bytes[name],
+                                        shape=(self.block, *shape))
+            self.views[name] = self.maps[name].view(np.ndarray)
+
+        self.block_start = start
+
+    def next_row(self) -> int:
+
+        # Index into views of the row to fill, the next block is mapped when one fills up
+        if self.rows - self.block_start == self.block:
+            self.__map(self.rows)
+            self.__write_meta()
+
+        self.rows += 1
+
+        return self.rows - 1 - self.block_start
+
+    def rewind(self, rows: int) -> None:
+
+        # Rows after rows are dropped, later rows overwrite them
+        if rows < self.block_start:
+            self.__map(rows - rows % self.block)
+
+        self.rows = min(rows, self.rows)
+
+    def flush(self) -> None:
+
+        for mapped in self.maps.values():
+            mapped.flush()
+
+    def __write_meta(self) -> None:
+
+        # Rewritten per block, a trace cut short is readable up to its last full block
+        with open(os.path.join(self.folder, META_NAME), 'w') as file:
+            json.dump({
+                'version': TRACE_VERSION, 'rows': self.rows,
+                'columns': {name: {'dtype': dtype, 'shape': list(shape)} for name, (dtype, shape) in self.columns.items()},
+                'attrs': self.attrs
+            }, file, indent=2)
+
+    def close(self) -> None:
+
+        if not self.files:
+            return
+
+        self.flush()
+        self.maps, self.views = {}, {}
+
+        for name, file in self.files.items():
+            file.truncate(self.rows * self.row_bytes[name])
+            file.close()
+
+        self.files = {}
+        self.__write_meta()
+
+
+class Trace:
+    # Read side of a trace, every column is a read-only memory map with one row per tick
+    def __init__(self, folder: str):
+
+        with open(os.path.join(folder, META_NAME)) as file:
+            meta = json.load(file)
+
+        if meta['version'] != TRACE_VERSION:
+            raise ValueError(f'Unknown trace version. (func=Trace.__init__, {folder=}, version={meta["version"]})')
+
+        self.folder: str = folder
+        self.rows: int = meta['rows']
+        self.attrs: Dict[str, object] = meta['attrs']
+        self.columns: Dict[str, np.ndarray] = {}
+
+        for name, column in meta['columns'].items():
+
+            shape = (self.rows, *column['shape'])
+
+            # Zero rows can not be mapped
+            if self.rows == 0:
+                self.columns[name] = np.zeros(shape, dtype=column['dtype'])
+            else:
+                self.columns[name] = np.memmap(os.path.join(folder, f'{name}.bin'), dtype=column['dtype'],
+                                               mode='r', shape=shape)
+
+    def __len__(self) -> int:
+
+        return self.rows
+
+    def __getitem__(self, name: str) -> np.ndarray:
+
+        return self.columns[name]
+
+    def heatmap(self, column: str, shape: Tuple[int, int]) -> np.ndarray:
+
+        # Ticks spent on every tile, column holds (x, y) tiles per row or per entity and row
+        tiles = self.columns[column].reshape(-1, 2).astype(np.int64)
+        counts = np.zeros(shape, dtype=np.int64)
+
+        np.add.at(counts, (tiles[:, 1], tiles[:, 0]), 1)
+
+        return counts
+
+
+class TickRecorder:
+    # Appends one row per game tick: Pacman and ghosts as Game.move left them,
+    # score and the per phase milliseconds the tick spent in the profiler
+    def __init__(self, game, folder: str, block: int = 4096):
+
+        self.game = game
+        self.ghosts: List[str] = list(game.ghosts)
+
+        self.phases: List[str] = ['Pacman.move', 'path scheduler', *(f'Ghost.move {name}' for name in self.ghosts),
+                                  'collisions', 'pathfinding']
+
+        if game.swarm is not None:
+            self.phases.append('GhostSwarm.move')
+
+        ghosts = len(self.ghosts)
+
+        self.writer: TraceWriter = TraceWriter(folder, {
+            'tick': ('u4', ()),
+            'score': ('i4', ()),
+            'level': ('u2', ()),
+            'pellets_left': ('u4', ()),
+            'pacman_pos': ('f4', (2,)),
+            'pacman_tile': ('i2', (2,)),
+            'pacman_dir': ('i1', (2,)),
+            'frightened': ('?', ()),
+            'ghost_pos': ('f4', (ghosts, 2)),
+            'ghost_tile': ('i2', (ghosts, 2)),
+            'ghost_dir': ('i1', (ghosts, 2)),
+            'ghost_dead': ('?', (ghosts,)),
+            'ghost_waiting': ('?', (ghosts,)),
+            'phase_ms': ('f4', (len(self.phases),))
+        }, attrs={
+            'field_path': game.field_path, 'seed': game.seed, 'tick_rate': game.tick_rate,
+            'tile_size': game.field.tile_size, 'field_shape': list(game.field.tiles.shape),
+            'ghosts': self.ghosts, 'phases': self.phases
+        }, block=block)
+
+        self.last_totals: np.ndarray = np.zeros(len(self.phases), dtype=np.float64)
+
+    @property
+    def rows(self) -> int:
+
+        return self.writer.rows
+
+    def record(self) -> None:
+
+        game, pacman = self.game, self.game.pacman
+        views = self.writer.views
+        i = self.writer.next_row()
+
+        views['tick'][i] = game.ticks
+        views['score'][i] = pacman.score
+        views['level'][i] = game.level
+        views['pellets_left'][i] = game.field.consumables.left
+        views['pacman_pos'][i] = pacman.screen_pos
+        views['pacman_tile'][i] = pacman.field_pos
+        views['pacman_dir'][i] = pacman.direction
+        views['frightened'][i] = pacman.can_eat_ghosts
+
+        if self.ghosts:
+
+            ghosts = list(game.ghosts.values())
+
+            views['ghost_pos'][i] = [ghost.screen_pos for ghost in ghosts]
+            views['ghost_tile'][i] = [ghost.field_pos for ghost in ghosts]
+            views['ghost_dir'][i] = [ghost.direction for ghost in ghosts]
+            views['ghost_dead'][i] = [ghost.is_dead for ghost in ghosts]
+            views['ghost_waiting'][i] = [ghost.waiting for ghost in ghosts]
+
+        # Profiler totals only grow, the tick took what they grew by since the last row
+        totals = np.array([game.profiler.totals.get(name, 0.0) for name in self.phases])
+        views['phase_ms'][i] = totals - self.last_totals
+        self.last_totals = totals
+
+    def rewind(self, rows: int) -> None:
+
+        self.writer.rewind(rows)
+
+    def close(self) -> None:
+
+        self.writer.close()
+
+
+if __name__ == '__main__':
+
+    parser = ArgumentParser(description='Summarize a tick trace written with --trace.')
+    parser.add_argument('folder')
+    parser.add_argument('--slowest', type=int, default=5, help='number of slowest ticks to list')
+    args = parser.parse_args()
+
+    trace = Trace(args.folder)
+    phases: Sequence[str] = trace.attrs['phases']
+    tick_ms = trace['phase_ms'].sum(axis=1) - trace['phase_ms'][:, phases.index('pathfinding')]
+
+    print(f'{len(trace)} ticks of {trace.attrs["field_path"]}, seed {trace.attrs["seed"]}.')
+
+    for j, name in enumerate(phases):
+        values = trace['phase_ms'][:, j]
+        print(f'{name:<24} mean {values.mean():7.3f}  p99 {np.percentile(values, 99):7.3f}  max {values.max():7.3f} ms')
+
+    for i in np.argsort(tick_ms)[::-1][:args.slowest].tolist():
+        print(f'tick {trace["tick"][i]}: {tick_ms[i]:.3f} ms, score {trace["score"][i]}')
@@ -0,0 +1,55 @@
+import os
+import sys
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import batch
+import main
+
+
+def failing_policy(seed):
+
+    # Seed 1 raises on its tenth tick, the other seeds never steer
+    def policy(game):
+
+        if seed == 1 and game.ticks == 10:
+            raise IndexError('list index out of range')
+
+    return policy
+
+
+def test_failed_game_is_recorded_and_closed(monkeypatch):
+
+    closed = []
+    close = main.Game.close
+
+    def counting_close(game):
+
+        closed.append(game)
+        close(game)
+
+    monkeypatch.setattr(main.Game, 'close', counting_close)
+    monkeypatch.setitem(batch.Policies, 'failing', failing_policy)
+    monkeypatch.setattr(batch, '_settings', {'field_path': 'field/field.txt', 'swarm': 0, 'ghosts': ['Red'],
+                                             'policy': 'failing', 'ticks': 50})
+
+    played, failed = batch.play_one(0), batch.play_one(1)
+
+    assert 'error' not in played and played['ticks'] == 50
+    assert failed['seed'] == 1 and 'IndexError' in failed['error']
+    assert len(closed) == 2
+
+
+def test_batch_survives_a_failed_game(monkeypatch, tmp_path):
+
+    # Workers fork from the test process and see the patched policies
+    monkeypatch.setitem(batch.Policies, 'failing', failing_policy)
+
+    report = batch.run_batch('field/field.txt', 3, ghosts=['Red'], policy='failing', ticks=50, workers=2,
+                             stream_path=os.path.join(tmp_path, 'games.jsonl'))
+
+    assert report['failed'] == 1
+    assert report['errors'][0]['seed'] == 1
+    assert report['summary']['ticks']['mean'] == 50
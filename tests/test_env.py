@@ -0,0 +1,46 @@
+import os
+import sys
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import env as e
+
+
+def episode_seeds(vector, resets):
+
+    # Seeds every env played, finished episodes are started over by step
+    seeds = [[env.seed] for env in vector.envs]
+
+    for _ in range(resets):
+
+        vector.step([0] * vector.count)
+
+        for played, env in zip(seeds, vector.envs):
+            played.append(env.seed)
+
+    return seeds
+
+
+def test_reset_envs_never_share_seeds():
+
+    # One tick per episode, every step finishes and resets every env
+    vector = e.VectorEnv(3, seed=1, max_ticks=1)
+    seeds = episode_seeds(vector, 3)
+
+    vector.close()
+
+    assert seeds == [[1, 4, 7, 10], [2, 5, 8, 11], [3, 6, 9, 12]]
+
+
+def test_explicit_seeds_are_kept():
+
+    environment = e.Env(seed=5, seed_stride=4)
+
+    environment.reset(20)
+    environment.reset()
+
+    assert environment.seed == 24
+
+    environment.close()
@@ -0,0 +1,46 @@
+import os
+import sys
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import navigation as nav
+
+
+def test_table_cache_is_keyed_on_wall_keys(tmp_path):
+
+    field_path = os.path.join(tmp_path, 'field.txt')
+
+    with open(field_path, 'w') as file:
+        file.write('w w w w\nw f f w\nw w w w\n')
+
+    play = [[1, 1, 1, 1], [1, 0, 0, 1], [1, 1, 1, 1]]
+    cache = os.path.join(tmp_path, 'cache')
+
+    nav.NextHopTable.for_field(field_path, play, ('w',), cache)
+    nav.NextHopTable.for_field(field_path, play, ('w', 'x'), cache)
+
+    assert len([name for name in os.listdir(cache) if name.endswith('.nht')]) == 2
+
+
+def test_table_of_another_grid_is_rebuilt(tmp_path):
+
+    field_path = os.path.join(tmp_path, 'field.txt')
+
+    with open(field_path, 'w') as file:
+        file.write('w w w\nw f w\n')
+
+    play = [[1, 1, 1], [1, 0, 1]]
+    cache = os.path.join(tmp_path, 'cache')
+
+    nav.NextHopTable.for_field(field_path, play, ('w',), cache)
+
+    # A stale table of a bigger grid sits where this field's table belongs
+    cache_path = os.path.join(cache, os.listdir(cache)[0])
+    nav.NextHopTable.build([[0, 0, 0], [0, 0, 0], [0, 0, 0]]).save(cache_path)
+
+    table = nav.NextHopTable.for_field(field_path, play, ('w',), cache)
+
+    assert (table.width, table.height, table.cells_count) == (3, 2, 1)
+    assert nav.NextHopTable.load(cache_path).cells_count == 1
@@ -0,0 +1,130 @@
+import os
+import sys
+import threading
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scheduler as sched
+
+
+class SlowGhost:
+    # Stands in for a Ghost, every search takes a while and counts how many overlap
+    def __init__(self):
+
+        self.waiting = False
+        self.target = 0
+        self.running = 0
+        self.most_running = 0
+        self.searches = 0
+        self.lock = threading.Lock()
+
+    def path_request(self):
+
+        return (0, 0), (0, 0), (self.target, 0), True
+
+    def search_path(self, request):
+
+        with self.lock:
+            self.running += 1
+            self.searches += 1
+            self.most_running = max(self.most_running, self.running)
+
+        time.sleep(.002)
+
+        with self.lock:
+            self.running -= 1
+
+        return [request[2]], False
+
+    def apply_path(self, path, advance):
+
+        pass
+
+
+def test_one_search_in_flight_per_ghost():
+
+    scheduler = sched.PathScheduler(workers=4)
+    ghosts = [SlowGhost() for _ in range(3)]
+
+    # Every ghost asks for a new target on every tick, faster than searches finish
+    for tick in range(200):
+
+        time.sleep(.0005)
+
+        scheduler.begin_tick()
+
+        for ghost in ghosts:
+            ghost.target = tick
+            scheduler.request(ghost)
+
+    scheduler.close()
+
+    for ghost in ghosts:
+        assert ghost.searches > 1
+        assert ghost.most_running == 1
+
+
+def test_restore_waits_for_searches_in_flight():
+
+    scheduler = sched.PathScheduler(workers=2)
+    ghost = SlowGhost()
+
+    state = scheduler.snapshot()
+    scheduler.request(ghost)
+    scheduler.restore(state)
+
+    assert ghost.running == 0
+    assert not scheduler.in_flight
+
+    scheduler.close()
+
+
+def test_game_with_path_workers(tmp_path):
+
+    import bench
+    from main import Game
+
+    # Too big for a next-hop table, ghosts search on their own planners
+    path = os.path.join(tmp_path, 'maze.txt')
+    bench.write_field(bench.generate_field(81, seed=1), path)
+
+    game = Game(headless=True, field_path=path, path_workers=4)
+    running = {}
+    most_running = {}
+    lock = threading.Lock()
+
+    for name, ghost in game.ghosts.items():
+
+        planner = ghost.planner
+
+        def find_path(begin, end, search=planner.find_path, name=name):
+
+            with lock:
+                running[name] = running.get(name, 0) + 1
+                most_running[name] = max(most_running.get(name, 0), running[name])
+
+            try:
+                return search(begin, end)
+            finally:
+                with lock:
+                    running[name] -= 1
+
+        planner.find_path = find_path
+
+    for tick in range(600):
+
+        if tick % 20 == 0:
+            game.steer(((0, -1), (1, 0), (0, 1), (-1, 0))[tick // 20 % 4])
+
+        game.move()
+
+        if game.pacman.is_caught:
+            break
+
+    game.close()
+
+    assert most_running
+    assert max(most_running.values()) == 1
@@ -0,0 +1,92 @@
+import os
+import sys
+from random import Random
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import topology as topo
+
+
+def test_random_target_is_never_near():
+
+    # Two free tiles side by side, every other draw would land on near
+    graph = topo.JunctionGraph([[1, 1, 1, 1],
+                                [1, 0, 0, 1],
+                                [1, 1, 1, 1]])
+    rng = Random(0)
+
+    for _ in range(50):
+        assert graph.random_target(rng, [1, 1]) == (2, 1)
+
+
+def test_random_target_of_a_single_tile():
+
+    graph = topo.JunctionGraph([[1, 1, 1],
+                                [1, 0, 1],
+                                [1, 1, 1]])
+
+    assert graph.random_target(Random(0), [1, 1]) is None
+
+
+def test_ghost_on_its_target_stands_still():
+
+    from main import Game
+
+    game = Game(headless=True)
+    ghost = game.ghosts['Yellow']
+
+    ghost.apply_path([tuple(ghost.field_pos)], False)
+
+    assert ghost.direction == [0, 0]
+
+    ghost.apply_path([], False)
+
+    assert ghost.direction == [0, 0]
+
+    game.close()
+
+
+def test_open_neighbours_from_the_maps():
+
+    import grid
+    import numpy as np
+
+    rows = [[1, 0, 1, 1],
+            [0, 0, 0, 2],
+            [1, 0, 1, 1]]
+    walkable = grid.walkable_mask(np.array(rows))
+
+    counts = grid.neighbour_counts(walkable)
+
+    assert [counts[y, x] for x, y in grid.mask_positions(walkable)] == [1, 1, 4, 2, 1, 1]
+
+    graph = topo.JunctionGraph(rows)
+
+    assert graph.find_path((1, 0), (3, 1))[1] == 3
+
+    # The door counts as open, the field border does not
+    assert graph.nodes.keys() == {(1, 1), (3, 1), (1, 0), (0, 1), (1, 2)}
+
+
+def test_compiled_field_reads_the_same_graph(tmp_path):
+
+    import bench
+    import fieldc
+    import grid
+
+    path = os.path.join(tmp_path, 'maze.txt')
+    bench.write_field(bench.generate_field(41, seed=2), path)
+
+    compiled = fieldc.CompiledField(fieldc.cached_compile(path, cache_folder=str(tmp_path)))
+    rows = compiled.play.tolist()
+    walkable = compiled.walkable()
+
+    built = topo.JunctionGraph(rows)
+    read = topo.JunctionGraph(rows, walkable, grid.neighbour_counts(walkable), buffer=compiled.topology)
+
+    assert list(read.nodes.items()) == list(built.nodes.items())
+    assert read.edges == built.edges and read.corridor_of == built.corridor_of
+    assert read.components == built.components and read.component_free == built.component_free
+    assert (read.component_of == built.component_of).all()
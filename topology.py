@@ -0,0 +1,397 @@
+from typing import Dict, List, Optional, Tuple
+from collections import deque
+from copy import copy
+from heapq import heappop, heappush
+from itertools import compress
+import gc
+from random import Random
+import struct
+import numpy as np
+import funcs as f
+import grid
+
+
+# One stretch of a corridor: walk the tiles full[i] to full[j] of an edge
+Leg = Tuple[int, int, int]
+
+GRAPH_MAGIC: bytes = b'JGR1'
+
+# magic, width, height, components, component tiles, nodes, edges, edge tiles
+GRAPH_HEADER = struct.Struct('<4s7I')
+
+
+class TilePath:
+    # Tile path that only expands its corridors when a ghost reaches them.
+    # It holds the first tile and a queue of legs, and supports what ghosts
+    # do with a path: read the next tiles, pop them and ask for the length.
+    def __init__(self, graph: 'JunctionGraph', begin: Tuple[int, int], legs: List[Leg], cost: int):
+
+        self.graph: JunctionGraph = graph
+        self.tiles: deque = deque((begin,))
+        self.legs: deque = deque(legs)
+        self.length: int = cost + 1
+
+    def __expand(self, count: int) -> None:
+
+        while len(self.tiles) < count and self.legs:
+
+            edge, i, j = self.legs.popleft()
+            full = self.graph.edges[edge][2]
+            step = 1 if j > i else -1
+
+            # The first tile of a leg is the last tile of the one before
+            self.tiles.extend(full[k] for k in range(i + step, j + step, step))
+
+    def __len__(self) -> int:
+
+        return self.length
+
+    def __getitem__(self, index: int) -> Tuple[int, int]:
+
+        if index < 0:
+            index += self.length
+
+        self.__expand(index + 1)
+
+        return self.tiles[index]
+
+    def __iter__(self):
+
+        self.__expand(self.length)
+
+        return iter(self.tiles)
+
+    def copy(self) -> 'TilePath':
+
+        # Corridors still unexpanded stay unexpanded in the copy
+        path = copy(self)
+        path.tiles = deque(self.tiles)
+        path.legs = deque(self.legs)
+
+        return path
+
+    def pop(self, index: int = 0) -> Tuple[int, int]:
+
+        if index != 0:
+            raise IndexError(f'Only the first tile can be popped. (func=TilePath.pop, {index=})')
+
+        self.__expand(1)
+        self.length -= 1
+
+        return self.tiles.popleft()
+
+
+class JunctionGraph:
+    # The ghost walkable part of a field reduced to junctions and dead ends,
+    # joined by corridor edges. Tiles with exactly two open neighbours only
+    # show up inside edges, so searches step over whole corridors at once.
+    # Components and graph are built up front while the field loads, compiled
+    # fields read them from the buffer compile_field stored with to_bytes.
+    # Fields hand in their walkability and neighbour count maps, nodes are read
+    # off the counts instead of asking every tile for its open neighbours.
+    def __init__(self, play_rows: List[List[int]], walkable: np.ndarray = None, neighbours: np.ndarray = None,
+                 buffer: memoryview = None):
+
+        self.play_rows: List[List[int]] = play_rows
+        self.height: int = len(play_rows)
+        self.width: int = len(play_rows[0])
+        self.steps: Tuple[Tuple[int, int]] = tuple((d[0], -d[1]) for d in f.adjacent())
+
+        self.walkable: np.ndarray = walkable if walkable is not None else grid.walkable_mask(np.array(play_rows))
+        self.neighbours: np.ndarray = neighbours if neighbours is not None else grid.neighbour_counts(self.walkable)
+
+        # Open steps of every tile as bits, and the steps of every bit pattern.
+        # Only the analysis walks tiles, a read leaves open_bits empty.
+        self.open_bits: List[List[int]] = []
+        self.open_steps: List[List[Tuple[int, int]]] = [
+            [step for i, step in enumerate(self.steps) if bits >> i & 1] for bits in range(1 << len(self.steps))
+        ]
+
+        # Pacman walkable tiles, the ones random targets are drawn from
+        self.free: np.ndarray = np.array(play_rows, dtype=np.uint8) == grid.FREE
+        self.free_cells: List[Tuple[int, int]] = grid.mask_positions(self.free)
+
+        self.component_of: np.ndarray = np.full((self.height, self.width), -1, dtype=np.int32)
+        self.components: List[List[Tuple[int, int]]] = []
+        self.component_free: List[List[Tuple[int, int]]] = []
+
+        # edges[i] is (a, b, full) where full runs over the tiles from node a to node b
+        self.nodes: Dict[Tuple[int, int], List[Tuple[Tuple[int, int], int, int]]] = {}
+        self.edges: List[Tuple[Tuple[int, int], Tuple[int, int], Tuple[Tuple[int, int]]]] = []
+        self.corridor_of: Dict[Tuple[int, int], Tuple[int, int]] = {}
+
+        # The graph is hundreds of thousands of tuples and lists without a single
+        # cycle, collections while they are made would only walk them over and over
+        collecting = gc.isenabled()
+        gc.disable()
+
+        try:
+
+            if buffer is not None:
+                self.__read(buffer)
+            else:
+                self.open_bits = grid.neighbour_bits(self.walkable, self.steps).tolist()
+                self.__label_components()
+                self.__build_graph()
+
+        finally:
+
+            if collecting:
+                gc.enable()
+
+    def __open(self, pos: Tuple[int, int]) -> List[Tuple[int, int]]:
+
+        x, y = pos
+
+        return [(x + dx, y + dy) for dx, dy in self.open_steps[self.open_bits[y][x]]]
+
+    def __label_components(self) -> None:
+
+        for x, y in grid.mask_positions(self.walkable):
+
+            if self.component_of[y, x] != -1:
+                continue
+
+            label = len(self.components)
+            cells = [(x, y)]
+            self.component_of[y, x] = label
+
+            for pos in cells:
+                for nx, ny in self.__open(pos):
+
+                    if self.component_of[ny, nx] == -1:
+                        self.component_of[ny, nx] = label
+                        cells.append((nx, ny))
+
+            self.components.append(cells)
+            self.component_free.append([pos for pos in cells if self.play_rows[pos[1]][pos[0]] == 0])
+
+    def __build_graph(self) -> None:
+
+        for pos in grid.mask_positions(self.walkable & (self.neighbours != 2)):
+            self.nodes[pos] = []
+
+        # Loops made only of corridor tiles get one of their tiles as a node
+        done = set()
+        pending = list(self.nodes)
+        corridor_cells = grid.mask_positions(self.walkable & (self.neighbours == 2))
+
+        while True:
+
+            for node in pending:
+                for first in self.__open(node):
+
+                    if (node, first) in done:
+                        continue
+
+                    full = [node]
+                    prev, current = node, first
+
+                    while current not in self.nodes:
+                        full.append(current)
+                        prev, current = current, next(pos for pos in self.__open(current) if pos != prev)
+
+                    full.append(current)
+                    done.add((node, first))
+                    done.add((current, prev))
+
+                    self.__add_edge(tuple(full))
+
+            pending = [pos for pos in corridor_cells if pos not in self.corridor_of and pos not in self.nodes][:1]
+
+            if not pending:
+                break
+
+            self.nodes[pending[0]] = []
+
+    def __add_edge(self, full: Tuple[Tuple[int, int]]) -> None:
+
+        edge = len(self.edges)
+        a, b = full[0], full[-1]
+
+        self.edges.append((a, b, full))
+        self.nodes[a].append((b, edge, 1))
+        self.nodes[b].append((a, edge, -1))
+
+        for i, pos in enumerate(full[1:-1], 1):
+            self.corridor_of[pos] = (edge, i)
+
+    def to_bytes(self) -> bytes:
+
+        # int32 sections: component labels, components and edges as offsets into
+        # their tiles, and the nodes. Edges are added back in the order they were
+        # built, so every node lists its edges in the same order after a read.
+        tiles = [pos for cells in self.components for pos in cells]
+        edge_tiles = [pos for _, _, full in self.edges for pos in full]
+
+        sections = (
+            self.component_of,
+            np.cumsum([0] + [len(cells) for cells in self.components]),
+            np.array(tiles).reshape(-1, 2),
+            np.array(list(self.nodes)).reshape(-1, 2),
+            np.cumsum([0] + [len(full) for _, _, full in self.edges]),
+            np.array(edge_tiles).reshape(-1, 2)
+        )
+
+        return GRAPH_HEADER.pack(GRAPH_MAGIC, self.width, self.height, len(self.components), len(tiles),
+                                 len(self.nodes), len(self.edges), len(edge_tiles)) + \
+            b''.join(np.ascontiguousarray(section, dtype=np.int32).tobytes() for section in sections)
+
+    def __read(self, buffer: memoryview) -> None:
+
+        buffer = memoryview(buffer).cast('B')
+        magic, width, height, components, tiles, nodes, edges, edge_tiles = GRAPH_HEADER.unpack_from(buffer)
+
+        if magic != GRAPH_MAGIC or (width, height) != (self.width, self.height):
+            raise ValueError(f'Not a junction graph of this field. (func=JunctionGraph, {width=}, {height=})')
+
+        sections: List[np.ndarray] = []
+        offset = GRAPH_HEADER.size
+
+        for count in (width * height, components + 1, tiles * 2, nodes * 2, edges + 1, edge_tiles * 2):
+            sections.append(np.frombuffer(buffer, np.int32, count, offset))
+            offset += count * 4
+
+        component_of, component_offsets, tiles, nodes, edge_offsets, edge_tiles = sections
+
+        self.component_of = component_of.reshape(height, width)
+
+        tiles = tiles.reshape(-1, 2)
+        free = self.free[tiles[:, 1], tiles[:, 0]].tolist()
+        tiles = list(map(tuple, tiles.tolist()))
+        offsets = component_offsets.tolist()
+
+        for i, j in zip(offsets, offsets[1:]):
+            self.components.append(tiles[i:j])
+            self.component_free.append(list(compress(tiles[i:j], free[i:j])))
+
+        for pos in map(tuple, nodes.reshape(-1, 2).tolist()):
+            self.nodes[pos] = []
+
+        edge_tiles = list(map(tuple, edge_tiles.reshape(-1, 2).tolist()))
+        offsets = edge_offsets.tolist()
+
+        for i, j in zip(offsets, offsets[1:]):
+            self.__add_edge(tuple(edge_tiles[i:j]))
+
+    def component(self, pos: Tuple[int, int]) -> int:
+
+        return int(self.component_of[pos[1], pos[0]])
+
+    def random_target(self, rng: Random, near: Tuple[int, int]) -> Optional[Tuple[int, int]]:
+
+        # A free tile in the same component other than near, so a path to it
+        # always exists and has a step to take
+        label = self.component(near)
+
+        if label == -1:
+            return None
+
+        free = self.component_free[label]
+        near = tuple(near)
+
+        if not free or free == [near]:
+            return None
+
+        target = rng.choice(free)
+
+        while target == near:
+            target = rng.choice(free)
+
+        return target
+
+    def __attach(self, pos: Tuple[int, int]) -> List[Tuple[Tuple[int, int], int, Leg]]:
+
+        # Links of a tile into the graph: itself for a node, both corridor ends otherwise
+        if pos in self.nodes:
+            return [(pos, 0, None)]
+
+        edge, i = self.corridor_of[pos]
+        a, b, full = self.edges[edge]
+
+        return [(a, i, (edge, i, 0)), (b, len(full) - 1 - i, (edge, i, len(full) - 1))]
+
+    def find_path(self, begin: Tuple[int, int], end: Tuple[int, int]) -> Tuple[TilePath, int]:
+
+        begin, end = tuple(begin), tuple(end)
+
+        f.astar_stats['calls'] += 1
+
+        label = self.component(begin)
+
+        if label == -1 or label != self.component(end):
+            return [], 0
+
+        best: Optional[Tuple[int, List[Leg]]] = None
+
+        # Both ends on one corridor, the direct stretch competes with the graph
+        if begin not in self.nodes and end not in self.nodes and \
+                self.corridor_of[begin][0] == self.corridor_of[end][0]:
+
+            edge, i = self.corridor_of[begin]
+            j = self.corridor_of[end][1]
+            best = (abs(i - j), [(edge, i, j)])
+
+        # Reaching a node of the end finishes the search with the leg into the end
+        exits: Dict[Tuple[int, int], List[Tuple[int, Leg]]] = {}
+
+        for node, cost, leg in self.__attach(end):
+            exits.setdefault(node, []).append((cost, None if leg is None else (leg[0], leg[2], leg[1])))
+
+        g: Dict[Tuple[int, int], int] = {}
+        came_from: Dict[Tuple[int, int], Tuple[Tuple[int, int], Leg]] = {}
+        heap: List[Tuple[int, int, Tuple[int, int]]] = []
+
+        for node, cost, leg in self.__attach(begin):
+            if cost < g.get(node, cost + 1):
+                g[node] = cost
+                came_from[node] = (None, leg)
+                heappush(heap, (cost + f.grid_dist(node, end), cost, node))
+
+        while heap:
+
+            estimate, cost, node = heappop(heap)
+
+            if best is not None and estimate >= best[0]:
+                break
+
+            if cost > g[node]:
+                continue
+
+            f.astar_stats['expanded'] += 1
+
+            for exit_cost, leg in exits.get(node, ()):
+                if best is None or cost + exit_cost < best[0]:
+                    best = (cost + exit_cost, self.__legs(came_from, node) + ([leg] if leg else []))
+
+            for other, edge, direction in self.nodes[node]:
+
+                length = len(self.edges[edge][2]) - 1
+                new_cost = cost + length
+
+                if new_cost < g.get(other, new_cost + 1):
+
+                    g[other] = new_cost
+                    leg = (edge, 0, length) if direction == 1 else (edge, length, 0)
+                    came_from[other] = (node, leg)
+
+                    heappush(heap, (new_cost + f.grid_dist(other, end), new_cost, other))
+
+        if best is None:
+            return [], 0
+
+        return TilePath(self, begin, best[1], best[0]), best[0]
+
+    @staticmethod
+    def __legs(came_from: Dict[Tuple[int, int], Tuple[Tuple[int, int], Leg]], node: Tuple[int, int]) -> List[Leg]:
+
+        legs: List[Leg] = []
+
+        while node is not None:
+
+            node, leg = came_from[node]
+
+            if leg is not None:
+                legs.append(leg)
+
+        return legs[::-1]